@@ -1,7 +1,30 @@
 # Import necessary packages here
 import os
+import re
+import sys
+import errno
 import shutil
-from typing import List
+import json
+import fnmatch
+import hashlib
+import numpy as np
+from datetime import datetime
+from collections import Counter
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, \
+    as_completed
+from typing import List, Iterator, Tuple, Callable, Dict, Union, \
+    TYPE_CHECKING
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+if TYPE_CHECKING:
+    import pandas as pd
 # ============================================================================
 # ============================================================================
 # Date:    December 10, 2020
@@ -16,6 +39,19 @@ __version__ = "1.0"
 # ============================================================================
 # ============================================================================
 
+# The Linux ioctl request that clones the extents of one file into another
+FICLONE = 0x40049409
+
+# The errors raised when a kernel copy mechanism is not supported for a
+# particular pair of files, in which case the next mechanism is tried
+_UNSUPPORTED_COPY = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP,
+                     errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM}
+
+# The number of bytes read from the start and the end of a file to compare
+# files of the same size before their contents are hashed in full
+PARTIAL_HASH_BLOCK = 1 << 16
+# ----------------------------------------------------------------------------
+
 
 class OSUtilities:
     """
@@ -73,13 +109,18 @@ class OSUtilities:
 # ----------------------------------------------------------------------------
 
     @classmethod
-    def copy_directory(cls, source: str, destination: str) -> None:
+    def copy_directory(cls, source: str, destination: str, workers: int = 1,
+                       progress: Callable[[int, int], None] = None) -> None:
         """
 
         :param source: The name and path-link of the directory to
                        be copied
         :param destination: The name and path-link for the directory
                             copy
+        :param workers: The number of files copied at the same time,
+                        defaulted to 1
+        :param progress: A function called as ``progress(copied, total)``
+                         each time a file has been copied, defaulted to None
         :return None:
 
         This function creates a copy of a directory and assigns
@@ -108,22 +149,44 @@ class OSUtilities:
            > print(list_contents())
            [''another_text_file.txt', 'dir2_copy']
 
+        Copying a tree of many small files is limited by the latency of
+        each individual copy rather than by the throughput of the storage,
+        particularly on network file systems.  When ``workers`` is greater
+        than 1, or a ``progress`` function is provided, the directory
+        structure is first recreated in the destination, parents before
+        children, and the files are then copied by a pool of ``workers``
+        threads, with ``progress`` called after each file is copied.  File
+        metadata is preserved in the same way as the serial copy.
+
+        .. code-block:: python
+
+           > def report(copied, total):
+           >     print('{} of {} files copied'.format(copied, total))
+           > copy_directory('directory_2', 'directory_3/dir2_copy',
+                            workers=16, progress=report)
         """
         if not os.path.isdir(source):
             print('{}{}'.format(source, ' does not exist'))
         elif os.path.isdir(destination):
             print('{}{}'.format(destination, ' already exists'))
+        elif workers > 1 or progress is not None:
+            cls._bulk_copy([], [(source, destination)], workers, progress)
         else:
             shutil.copytree(source, destination)
 # ----------------------------------------------------------------------------
 
     @classmethod
-    def copy_file(cls, source: str, destination: str) -> None:
+    def copy_file(cls, source: str, destination: str,
+                  kernel_copy: bool = False) -> None:
         """
 
         :param source: The name and path-link of the file to be
                        copied
         :param destination: The name and path-link for the file copy
+        :param kernel_copy: `True` if the data should be copied by the
+                            operating system kernel without passing through
+                            a user space buffer, `False` otherwise.
+                            Defaulted to `False`
         :return None:
 
         This function creates a copy of a file and assigns it to the
@@ -151,15 +214,70 @@ class OSUtilities:
            > print(list_contents())
            [''another_text_file.txt', 'text_copy.txt']
 
+        When ``kernel_copy`` is `True` the file data is copied with the
+        fastest mechanism the platform supports, trying each of the
+        following in turn.
+
+        * A reflink clone through the ``FICLONE`` ioctl, which shares the
+          data blocks of the source on copy-on-write file systems such as
+          Btrfs and XFS and completes almost instantly for any file size
+        * ``os.copy_file_range``, which copies the data inside the kernel
+          and may be offloaded to the storage device or the NFS server
+        * ``os.sendfile``, which also copies the data inside the kernel
+        * A buffered copy in user space
+
+        Only the file data is copied in this mode.  The permission bits of
+        the copy are determined by the user's umask rather than copied from
+        the source.
+
+        .. code-block:: python
+
+           > copy_file('large_data.bin', 'directory_3/large_data.bin',
+                       kernel_copy=True)
         """
         if not os.path.isfile(source):
             print('{}{}'.format(source, ' does not exist'))
         elif os.path.isfile(destination):
             print('{}{}'.format(destination, ' already exists'))
+        elif kernel_copy:
+            if os.path.isdir(destination):
+                destination = os.path.join(destination,
+                                           os.path.basename(source))
+            cls._kernel_copy(source, destination)
         else:
             shutil.copy(source, destination)
 # ----------------------------------------------------------------------------
 
+    @classmethod
+    def count_lines_in_files(cls, file_names: List[str],
+                             workers: int = 4) -> Dict[str, int]:
+        """
+
+        :param file_names: A list of file names to include the path-link
+        :param workers: The number of files counted at the same time,
+                        defaulted to 4
+        :return lines: A dictionary containing the number of lines in each
+                       file, keyed by file name
+
+        This function counts the lines of many files with a pool of threads
+        using ``file_line_count``.  Reading the files dominates the time
+        taken, and the threads overlap the reads of different files, which
+        is most effective for directories of many log files or on network
+        file systems.
+
+        .. code-block:: python
+
+           > files = [entry.path for entry in
+                      util.walk_directory('logs', extension='.log')]
+           > lines = util.count_lines_in_files(files, workers=16)
+           > print(sum(lines.values()))
+           1843309
+        """
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            counts = executor.map(cls.file_line_count, file_names)
+            return dict(zip(file_names, counts))
+# ----------------------------------------------------------------------------
+
     @classmethod
     def count_occurrence_of_word_in_file(cls, file_name: str, word: str) -> int:
         """
@@ -191,18 +309,145 @@ class OSUtilities:
            > num = util.count_occurrence_of_word_in_file('test.txt', 'file')
            > print(num)
            4
+
+        The file is read in fixed size blocks, so files of any size are
+        searched in constant memory.  To count several words use
+        ``count_occurrence_of_words_in_file``, which reads the file once
+        for all of the words.
+        """
+        return cls.count_occurrence_of_words_in_file(file_name, [word])[word]
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def count_occurrence_of_words_in_file(cls, file_name: str,
+                                          words: List[str],
+                                          chunk_size: int = 1 << 20) -> Dict[str, int]:
+        """
+
+        :param file_name: The file name to include the path link
+        :param words: A list of the words for which the number of
+                      occurrences in a file is desired
+        :param chunk_size: The number of characters read from the file at a
+                           time, defaulted to 1048576
+        :return counts: A dictionary containing the number of times each
+                        word occurs in the file
+
+        This function counts the occurrences of many words in a single pass
+        through a file, with the same treatment of punctuation as
+        ``count_occurrence_of_word_in_file``.  The file is read in blocks of
+        ``chunk_size`` characters, and a word that is split across two
+        blocks is carried over and counted once, so the memory used does not
+        depend on the size of the file.  Using the ``test.txt`` file shown
+        for ``count_occurrence_of_word_in_file``;
+
+        .. code-block:: python
+
+           > counts = util.count_occurrence_of_words_in_file('test.txt',
+                                                             ['file', 'this'])
+           > print(counts)
+           {'file': 4, 'this': 1}
+        """
+        counts = dict.fromkeys(words, 0)
+        for _, tokens in cls._read_words(file_name, chunk_size):
+            cls._tally_words(counts, tokens)
+        return counts
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def count_patterns_in_files(cls, file_names: List[str],
+                                patterns: List[str], regex: bool = False,
+                                ignore_case: bool = False, workers: int = 1,
+                                chunk_size: int = 1 << 20,
+                                as_frame: bool = False) -> np.ndarray:
         """
-        file = open(file_name, "rt")
-        data = file.read().split()
-        counter = 0
-        for i in range(len(data)):
-            if data[i] == word:
-                counter += 1
-            if data[i] == word + ',':
-                counter += 1
-            if data[i] == word + '.':
-                counter += 1
-        return counter
+
+        :param file_names: A list of file names to include the path-link
+        :param patterns: A list of the keywords, or regular expressions,
+                         to be counted
+        :param regex: `True` if the patterns are regular expressions,
+                      `False` if they are keywords.  Defaulted to `False`
+        :param ignore_case: `True` if upper and lower case letters are
+                            treated as the same, `False` otherwise.
+                            Defaulted to `False`
+        :param workers: The number of processes used to search the files,
+                        defaulted to 1
+        :param chunk_size: The number of characters read from a file at a
+                           time, defaulted to 1048576
+        :param as_frame: `True` if the counts are returned as a pandas
+                         DataFrame indexed by file name with one column for
+                         each pattern, `False` for a NumPy array.  Defaulted
+                         to `False`
+        :return counts: A NumPy array with one row for each file and one
+                        column for each pattern, containing the number of
+                        times the pattern occurs in the file
+
+        This function counts the occurrences of many keywords in many files
+        while reading each file only once.  The keywords are merged into a
+        single regular expression shaped like a prefix tree, in which the
+        keywords that share a prefix share one branch, so at each position
+        in the text at most one branch is followed for each character
+        rather than every keyword being tried in turn.  A keyword only
+        matches whole words, so ``file`` is counted in
+        ``file,`` but not in ``files``, and where keywords overlap the
+        longest keyword at a position is counted.  When ``regex`` is `True`
+        each pattern is a regular expression that is compiled and searched
+        for on its own, so every pattern is counted wherever it matches,
+        even where the matches of different patterns overlap, and patterns
+        may contain their own groups and backreferences, but the text is
+        searched once for every pattern.  Files are read in
+        blocks of ``chunk_size`` characters that end on a line boundary, so
+        a match can not extend over more than one line.  As with
+        ``text_stats``, scripts that use more than one worker on Windows or
+        macOS must call this function from within an
+        ``if __name__ == '__main__':`` block.  Using the ``test.txt`` file
+        shown for ``count_occurrence_of_word_in_file``;
+
+        .. code-block:: python
+
+           > counts = util.count_patterns_in_files(['test.txt'],
+                                                   ['file', 'this'],
+                                                   ignore_case=True)
+           > print(counts)
+           [[4 2]]
+
+           > files = [entry.path for entry in
+                      util.walk_directory('logs', extension='.log')]
+           > counts = util.count_patterns_in_files(files, [r'ERROR [0-9]+'],
+                                                   regex=True, workers=8)
+
+           > counts = util.count_patterns_in_files(['test.txt'],
+                                                   ['file', 'this'],
+                                                   ignore_case=True,
+                                                   as_frame=True)
+           > print(counts)
+                     file  this
+           test.txt     4     2
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        unique = list(dict.fromkeys(p.lower() if ignore_case and not regex
+                                    else p for p in patterns))
+        if regex:
+            expressions = unique
+        else:
+            expressions = [r'(?<!\w)(?:{})(?!\w)'.format(
+                cls._keyword_trie(unique))]
+        columns = [p.lower() if ignore_case and not regex else p
+                   for p in patterns]
+
+        jobs = (file_names, repeat(expressions), repeat(flags), repeat(regex),
+                repeat(chunk_size))
+        if workers == 1 or len(file_names) < 2:
+            found = list(map(cls._count_patterns, *jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                found = list(executor.map(cls._count_patterns, *jobs))
+        counts = np.zeros((len(file_names), len(patterns)), dtype=np.int64)
+        for row, matches in enumerate(found):
+            counts[row] = [matches[key] for key in columns]
+        if as_frame:
+            import pandas as pd
+            return pd.DataFrame(counts, index=file_names, columns=patterns)
+        return counts
 # ----------------------------------------------------------------------------
 
     @classmethod
@@ -387,10 +632,107 @@ class OSUtilities:
 # ----------------------------------------------------------------------------
 
     @classmethod
-    def file_line_count(cls, file_name: str) -> int:
+    def directory_usage(cls, directory: str = '.', workers: int = 4,
+                        cache: dict = None) -> Dict[str, int]:
+        """
+
+        :param directory: The directory to be measured to include the
+                          path-link, defaulted to the current working
+                          directory
+        :param workers: The number of sub-directories measured at the same
+                        time, defaulted to 4
+        :param cache: A dictionary that stores the contents of each
+                      directory between calls, defaulted to None
+        :return usage: A dictionary containing the total size in bytes of
+                       each directory in the tree, including all of its
+                       sub-directories, keyed by the directory path
+
+        This function determines the space used by a directory and each of
+        its sub-directories in the manner of the ``du`` command.  The tree
+        is searched with ``os.scandir`` and each sub-directory of
+        ``directory`` is measured by a separate thread.  Sizes are the
+        apparent size of each file in bytes, rather than the space allocated
+        on the disk, and symbolic links are counted but not followed.  A
+        file with several hard links is only counted once, in the first
+        directory where it is found.  As an example lets assume the
+        following directory structure;
+
+        .. code-block:: text
+
+           directory_1
+              |
+              text_file.txt
+              directory_2
+                 |
+                 data.csv
+              directory_3
+                 |
+                 photo.jpg
+
+        The following code will determine the space used by each directory
+
+        .. code-block:: python
+
+           > usage = util.directory_usage('directory_1')
+           > for path, size in usage.items():
+           >     print(path, size)
+           directory_1 3538944
+           directory_1/directory_2 2048
+           directory_1/directory_3 3533312
+
+        When a ``cache`` dictionary is provided, the files in each directory
+        are only listed again if the modification time of the directory has
+        changed since the last call, so measuring a large tree that changes
+        slowly only requires a ``stat`` of each directory.  The modification
+        time of a directory changes when files are added, removed or
+        renamed, but not when an existing file is rewritten, so the size of
+        a file that grows in place will not be updated until another change
+        is made to its directory.  The cache can be saved between sessions
+        with ``pickle``.
+
+        .. code-block:: python
+
+           > cache = {}
+           > usage = util.directory_usage('directory_1', cache=cache)
+           > usage = util.directory_usage('directory_1', cache=cache)
+        """
+        if cache is None:
+            cache = {}
+        records = cls._scan_usage(directory, None, cache, False)
+        top = records[0][4] if records else []
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for subtree in executor.map(cls._scan_usage, top,
+                                        repeat(directory), repeat(cache)):
+                records.extend(subtree)
+
+        usage = {}
+        parents = {}
+        seen = set()
+        for path, parent, size, linked, _ in records:
+            for device, inode, link_size in linked:
+                if (device, inode) not in seen:
+                    seen.add((device, inode))
+                    size += link_size
+            usage[path] = size
+            parents[path] = parent
+        for path, _, _, _, _ in reversed(records):
+            if parents[path] is not None:
+                usage[parents[path]] += usage[path]
+
+        prefix = os.path.join(directory, '')
+        for path in [key for key in cache if key.startswith(prefix) and
+                     key not in usage]:
+            del cache[path]
+        return usage
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def file_line_count(cls, file_name: str, chunk_size: int = 1 << 20) -> int:
         """
 
         :param file_name: The file name to include the path-link
+        :param chunk_size: The number of bytes read at a time, defaulted
+                           to 1048576
         :return lines: The number of lines in a file
 
         This function returns the number of lines in an ASCII
@@ -411,8 +753,23 @@ class OSUtilities:
            > num = util.file_line_count('test.txt')
            > print(num)
            4
+
+        The file is read as bytes in blocks of ``chunk_size`` and the
+        newline characters in each block are counted without decoding the
+        text, so files of several gigabytes are counted quickly and in
+        constant memory.  A final line that does not end with a newline is
+        counted as a line.  To count the lines of many files at once use
+        ``count_lines_in_files``.
         """
-        return len(open(file_name).readlines())
+        lines = 0
+        last = b''
+        with open(file_name, 'rb') as file:
+            for block in iter(lambda: file.read(chunk_size), b''):
+                lines += block.count(b'\n')
+                last = block[-1:]
+        if last and last != b'\n':
+            lines += 1
+        return lines
 # ----------------------------------------------------------------------------
 
     @classmethod
@@ -442,10 +799,123 @@ class OSUtilities:
            > print(num)
            21
 
+        The file is read in fixed size blocks, so files of any size are
+        counted in constant memory.
         """
-        file = open(file_name, "rt")
-        data = file.read()
-        return len(data.split())
+        return sum(len(tokens) for _, tokens in cls._read_words(file_name))
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def find_duplicates(cls, directory: str = '.', min_size: int = 1,
+                        workers: int = 4, algorithm: str = 'blake2b',
+                        index_file: str = None) -> List[List[str]]:
+        """
+
+        :param directory: The directory to be searched to include the
+                          path-link, defaulted to the current working
+                          directory
+        :param min_size: The minimum size in bytes of the files compared,
+                         defaulted to 1 so that empty files are ignored
+        :param workers: The number of files hashed at the same time,
+                        defaulted to 4
+        :param algorithm: The name of a ``hashlib`` algorithm, or
+                          ``'xxhash'`` if the optional ``xxhash`` package
+                          is installed.  Defaulted to ``'blake2b'``
+        :param index_file: The name of a JSON file, to include the
+                           path-link, where the hashes of the files are
+                           stored between calls, defaulted to None
+        :return duplicates: A list containing a list of the paths of each
+                            group of files with identical contents, with
+                            the largest files first
+
+        This function finds the files in a directory and its
+        sub-directories that have identical contents.  Hashing every file
+        in full would read the entire tree from the disk, so the files are
+        compared in three stages, and a file only passes to the next stage
+        while it still matches another file.
+
+        * Files are grouped by size, which only requires the directory
+          listing
+        * Files of the same size are compared by a hash of their first and
+          last ``PARTIAL_HASH_BLOCK`` bytes
+        * Files that still match are compared by a hash of their entire
+          contents
+
+        Hashes are computed by a pool of ``workers`` threads.  Paths that
+        are hard links to the same file, and symbolic links, are not
+        reported as duplicates.  When an ``index_file`` is provided the
+        hashes are written to it, and a later call reuses the hash of any
+        file whose size and modification time have not changed.  As an
+        example lets assume the following directory structure, where
+        ``photo_copy.jpg`` is a copy of ``photo.jpg``;
+
+        .. code-block:: text
+
+           directory_1
+              |
+              photo.jpg
+              text_file.txt
+              directory_2
+                 |
+                 photo_copy.jpg
+
+        The following code will find the copy
+
+        .. code-block:: python
+
+           > duplicates = util.find_duplicates('directory_1',
+                                               index_file='hashes.json')
+           > print(duplicates)
+           [['directory_1/directory_2/photo_copy.jpg', 'directory_1/photo.jpg']]
+        """
+        if algorithm == 'xxhash' and xxhash is None:
+            sys.exit('FATAL ERROR: The xxhash package is not installed')
+        stored = {}
+        if index_file is not None and os.path.isfile(index_file):
+            with open(index_file) as file:
+                index = json.load(file)
+            if index.get('algorithm') == algorithm:
+                stored = index['files']
+
+        sizes = {}
+        files = {}
+        inodes = set()
+        for entry in cls.walk_directory(directory, min_size=min_size):
+            if entry.is_symlink():
+                continue
+            status = entry.stat(follow_symlinks=False)
+            if status.st_ino:
+                if (status.st_dev, status.st_ino) in inodes:
+                    continue
+                inodes.add((status.st_dev, status.st_ino))
+            record = [status.st_size, status.st_mtime_ns, None, None]
+            previous = stored.get(entry.path)
+            if previous is not None and previous[:2] == record[:2]:
+                record = previous
+            files[entry.path] = record
+            sizes.setdefault(status.st_size, []).append(entry.path)
+
+        groups = [paths for paths in sizes.values() if len(paths) > 1]
+        groups = cls._hash_groups(
+            groups, files, 2, workers,
+            lambda path: cls._file_hash(path, algorithm=algorithm,
+                                        partial=True))
+        for paths in groups:
+            for path in paths:
+                if files[path][0] <= 2 * PARTIAL_HASH_BLOCK:
+                    files[path][3] = files[path][2]
+        groups = cls._hash_groups(
+            groups, files, 3, workers,
+            lambda path: cls._file_hash(path, algorithm=algorithm))
+
+        if index_file is not None:
+            with open(index_file, 'w') as file:
+                json.dump({'algorithm': algorithm,
+                           'files': {path: record for path, record in
+                                     files.items() if record[2] is not None}},
+                          file)
+        groups = [sorted(paths) for paths in groups]
+        return sorted(groups, key=lambda paths: (-files[paths[0]][0], paths))
 # ----------------------------------------------------------------------------
 
     @classmethod
@@ -579,7 +1049,9 @@ class OSUtilities:
 
     @classmethod
     def copy_files(cls, destination: str, source: str = os.getcwd(),
-                   extension: str = 'NULL', dirs: bool = False) -> None:
+                   extension: str = 'NULL', dirs: bool = False,
+                   workers: int = 1,
+                   progress: Callable[[int, int], None] = None) -> None:
         """
 
         :param destination: The destination directory to include
@@ -589,13 +1061,21 @@ class OSUtilities:
         :param extension: Specific file extension to be copied.
         :param dirs: `True` if user only wants to copy directories,
                      `False` otherwise
+        :param workers: The number of files copied at the same time,
+                        defaulted to 1
+        :param progress: A function called as ``progress(copied, total)``
+                         each time a file has been copied, defaulted to None
 
         :return None:
 
         This function will copy all of the contents of a directory
         to another directory, or all of a specific type of file to
         another directory, or all directories to another directory.
-        As an example lets assume the following directory structure;
+        Files and directories are distinguished with the type information
+        returned by ``os.scandir``, so extensionless files are copied as
+        files and directories with a `.` in their name are copied as
+        directories.  As an example lets assume the following directory
+        structure;
 
         .. code-block:: text
 
@@ -669,19 +1149,37 @@ class OSUtilities:
                  another_text_file.txt
                  more_data.doc
                  new_dir
+
+        As with ``copy_directory``, the files and the contents of the
+        directories can be copied by a pool of ``workers`` threads, with
+        ``progress`` reporting the number of files copied.
+
+        .. code-block:: python
+
+           > util.copy_files('../directory_2', workers=16)
         """
         if dirs and extension != 'NULL':
             print('{}'.format('extension must be null when dirs is True'))
-        files = OSUtilities.list_contents(source, extension)
-        directories = [i for i in files if '.' not in i]
-        fls = [i for i in files if '.' in i]
+        fls, directories = OSUtilities._classify_entries(source, extension)
+        if workers > 1 or progress is not None:
+            jobs = [] if dirs else [(os.path.join(source, i),
+                                     os.path.join(destination, i)) for i in fls]
+            trees = []
+            for j in directories:
+                target = os.path.join(destination, j)
+                if os.path.isdir(target):
+                    print('{}{}'.format(target, ' already exists'))
+                else:
+                    trees.append((os.path.join(source, j), target))
+            cls._bulk_copy(jobs, trees, workers, progress)
+            return
         if not dirs:
             for i in fls:
-                src = source + "/" + i
+                src = os.path.join(source, i)
                 OSUtilities.copy_file(src, destination)
         for j in directories:
-            src = source + "/" + j
-            OSUtilities.copy_directory(src, destination + "/" + j)
+            src = os.path.join(source, j)
+            OSUtilities.copy_directory(src, os.path.join(destination, j))
 # ----------------------------------------------------------------------------
 
     @classmethod
@@ -701,8 +1199,12 @@ class OSUtilities:
 
         This function will move all of the contents of a directory
         to another directory, or all of a specific type of file to
-        another directory, or all directories to another directory
-        As an example lets assume the following directory structure;
+        another directory, or all directories to another directory.
+        Files and directories are distinguished with the type information
+        returned by ``os.scandir``, so extensionless files are moved as
+        files and directories with a `.` in their name are moved as
+        directories.  As an example lets assume the following directory
+        structure;
 
         .. code-block:: text
 
@@ -773,16 +1275,178 @@ class OSUtilities:
         """
         if dirs and extension != 'NULL':
             print('{}'.format('extension must be null when dirs is True'))
-        files = OSUtilities.list_contents(source, extension)
-        directories = [i for i in files if '.' not in i]
-        fls = [i for i in files if '.' in i]
+        fls, directories = OSUtilities._classify_entries(source, extension)
         if not dirs:
             for i in fls:
-                src = source + "/" + i
+                src = os.path.join(source, i)
                 OSUtilities.move_file(src, destination)
         for j in directories:
-            src = source + "/" + j
-            OSUtilities.move_directory(src, destination + "/" + j)
+            src = os.path.join(source, j)
+            OSUtilities.move_directory(src, os.path.join(destination, j))
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def sync_directory(cls, source: str, destination: str,
+                       checksum: bool = False, delete: bool = False,
+                       workers: int = 1,
+                       progress: Callable[[int, int], None] = None) -> Dict[str, int]:
+        """
+
+        :param source: The name and path-link of the directory to be
+                       mirrored
+        :param destination: The name and path-link of the mirror, which is
+                            created if it does not exist
+        :param checksum: `True` if files of the same size are compared by
+                         the hash of their contents, `False` if they are
+                         compared by modification time.  Defaulted to `False`
+        :param delete: `True` if files and directories in the destination
+                       that do not exist in the source are deleted, `False`
+                       otherwise.  Defaulted to `False`
+        :param workers: The number of files compared and copied at the same
+                        time, defaulted to 1
+        :param progress: A function called as ``progress(checked, total)``
+                         each time a file has been checked, defaulted to None
+        :return counts: A dictionary containing the number of files
+                        ``'copied'``, ``'skipped'`` and ``'deleted'``
+
+        This function makes the destination directory a mirror of the
+        source directory in the manner of ``rsync``, copying only the files
+        that are new or have changed since the last synchronization.  A
+        file is considered changed when its size or its modification time,
+        to the nearest second, differ from the copy in the destination.
+        When ``checksum`` is `True` files with the same size are instead
+        compared by the BLAKE2 hash of their contents, which detects changes
+        that preserve the modification time at the cost of reading both
+        files.  Copied files keep the permission bits and time stamps of
+        the source, so an unchanged file is skipped by the next
+        synchronization.  Symbolic links in the source are followed, so a
+        directory reached through a link is mirrored as a copy under the
+        name of the link as well as under its own name.  Links whose target
+        does not exist, and links to a directory that contains them, are
+        not copied.  As an example lets assume the following directory
+        structure;
+
+        .. code-block:: text
+
+           directory_1
+              |
+              directory_2
+                 |
+                 text_file.txt
+                 data.csv
+              mirror
+                 |
+                 text_file.txt
+                 old_data.csv
+
+        The following command copies ``data.csv`` to the mirror and deletes
+        ``old_data.csv``, assuming ``text_file.txt`` has not changed
+
+        .. code-block:: python
+
+           > counts = util.sync_directory('directory_2', 'mirror',
+                                          delete=True)
+           > print(counts)
+           {'copied': 1, 'skipped': 1, 'deleted': 1}
+        """
+        counts = {'copied': 0, 'skipped': 0, 'deleted': 0}
+        if not os.path.isdir(source):
+            print('{}{}'.format(source, ' does not exist'))
+            return counts
+        if not os.path.isdir(destination):
+            os.makedirs(destination)
+        jobs = []
+        present = set()
+        created = [(source, destination)]
+        for entry in cls.walk_directory(source, dirs=True,
+                                        follow_symlinks=True):
+            relative = os.path.relpath(entry.path, source)
+            target = os.path.join(destination, relative)
+            if entry.is_dir():
+                if not os.path.isdir(target):
+                    if os.path.lexists(target):
+                        os.remove(target)
+                    os.mkdir(target)
+                created.append((entry.path, target))
+            else:
+                try:
+                    status = entry.stat()
+                except OSError:
+                    continue
+                jobs.append((entry.path, target, status))
+            present.add(relative)
+
+        checked = 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = [executor.submit(cls._sync_file, src, dst, status,
+                                       checksum)
+                       for src, dst, status in jobs]
+            for future in as_completed(futures):
+                counts['copied' if future.result() else 'skipped'] += 1
+                checked += 1
+                if progress is not None:
+                    progress(checked, len(jobs))
+
+        if delete:
+            for root, directories, names in os.walk(destination):
+                for name in names + directories:
+                    path = os.path.join(root, name)
+                    if os.path.relpath(path, destination) in present:
+                        continue
+                    if os.path.isdir(path) and not os.path.islink(path):
+                        shutil.rmtree(path)
+                        directories.remove(name)
+                    else:
+                        os.remove(path)
+                    counts['deleted'] += 1
+
+        # Directory times are copied last, since copying files into a
+        # directory updates its modification time
+        for src, dst in reversed(created):
+            shutil.copystat(src, dst)
+        return counts
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def text_stats(cls, file_names: List[str], words: List[str] = None,
+                   workers: int = None) -> Dict[str, dict]:
+        """
+
+        :param file_names: A list of file names to include the path-link
+        :param words: A list of words for which the number of occurrences in
+                      each file is desired, defaulted to None
+        :param workers: The number of processes used to read the files,
+                        defaulted to the number of processors on the computer
+        :return stats: A dictionary keyed by file name, where each value is
+                       a dictionary containing the ``'lines'``, ``'words'``
+                       and ``'bytes'`` in the file and the ``'occurrences'``
+                       of each word in ``words``
+
+        This function determines the information returned by
+        ``file_line_count``, ``file_word_count``, ``determine_file_size``
+        and ``count_occurrence_of_words_in_file`` for many files while
+        reading each file only once.  Splitting text into words is limited
+        by the processor rather than by the disk, so the files are divided
+        between a pool of ``workers`` processes.  Since the processes import
+        this module, scripts that call this function on Windows or macOS
+        must do so from within an ``if __name__ == '__main__':`` block.
+        Using the ``test.txt`` file shown for ``file_word_count``;
+
+        .. code-block:: python
+
+           > stats = util.text_stats(['test.txt'], words=['file'])
+           > print(stats['test.txt'])
+           {'lines': 4, 'words': 21, 'bytes': 109, 'occurrences': {'file': 4}}
+        """
+        words = [] if words is None else list(words)
+        if workers == 1 or len(file_names) < 2:
+            stats = [cls._text_stats(file_name, words)
+                     for file_name in file_names]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                stats = list(executor.map(cls._text_stats, file_names,
+                                          repeat(words)))
+        return dict(zip(file_names, stats))
 # ----------------------------------------------------------------------------
 
     @classmethod
@@ -819,6 +1483,839 @@ class OSUtilities:
            False
         """
         return os.path.isfile(file_name)
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def walk_directory(cls, directory: str = '.', extension: str = None,
+                       pattern: str = None, min_size: int = None,
+                       max_size: int = None, files: bool = True,
+                       dirs: bool = False,
+                       follow_symlinks: bool = False) -> Iterator[os.DirEntry]:
+        """
+
+        :param directory: The directory to be searched to include the
+                          path-link, defaulted to the current working
+                          directory
+        :param extension: A file extension such as `.txt` or `.csv`.  Only
+                          entries whose names end with the extension are
+                          returned.  Defaulted to None
+        :param pattern: A glob style pattern such as `data_*.csv` that the
+                        names of the returned entries must match.  Defaulted
+                        to None
+        :param min_size: The minimum size of a returned file in bytes,
+                         defaulted to None
+        :param max_size: The maximum size of a returned file in bytes,
+                         defaulted to None
+        :param files: `True` if files are returned, `False` otherwise.
+                      Defaulted to `True`
+        :param dirs: `True` if directories are returned, `False` otherwise.
+                     Defaulted to `False`
+        :param follow_symlinks: `True` if symbolic links to directories are
+                                searched, `False` otherwise.  Defaulted to
+                                `False`
+        :return entries: A generator of ``os.DirEntry`` objects
+
+        This function searches a directory and all of its sub-directories
+        and returns the entries that pass every filter one at a time, so
+        trees containing millions of files can be processed without holding
+        a list of them in memory.  The search is built on ``os.scandir``,
+        whose ``os.DirEntry`` objects determine whether an entry is a file
+        or a directory from the directory listing itself and cache the
+        result of ``stat``, so the ``is_file``, ``is_dir`` and ``stat``
+        methods of the returned entries do not make additional system calls
+        in most cases.  A directory is always returned before any of its
+        contents, and directories that cannot be read are skipped.  Entries
+        that are neither files nor directories are never returned, which
+        includes symbolic links when ``follow_symlinks`` is `False` and
+        links whose target does not exist.  When ``follow_symlinks`` is
+        `True` a directory reached through several links is searched once
+        for each path, as ``shutil.copytree`` would copy it, and only a link
+        to one of the directories that contain it is skipped, since
+        following it would never end.  A message is printed and nothing is
+        returned if ``directory`` does not exist.  As an example lets assume
+        the following directory structure;
+
+        .. code-block:: text
+
+           directory_1
+              |
+              text_file.txt
+              data.csv
+              directory_2
+                 |
+                 another_text_file.txt
+                 more_data.csv
+
+        The following code will find the csv files in the tree
+
+        .. code-block:: python
+
+           > for entry in util.walk_directory('directory_1', extension='.csv'):
+           >     print(entry.path, entry.stat().st_size)
+           directory_1/data.csv 2048
+           directory_1/directory_2/more_data.csv 4096
+
+           > large = [entry.path for entry in
+                      util.walk_directory('directory_1', min_size=1024 ** 3)]
+        """
+        if not os.path.isdir(directory):
+            print('{}{}'.format(directory, ' does not exist'))
+            return
+        ancestors = frozenset()
+        if follow_symlinks:
+            status = os.stat(directory)
+            ancestors = frozenset([(status.st_dev, status.st_ino)])
+        pending = [(directory, ancestors)]
+        while pending:
+            path, ancestors = pending.pop()
+            try:
+                scanner = os.scandir(path)
+            except OSError:
+                continue
+            children = []
+            with scanner:
+                for entry in scanner:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+                        is_file = not is_dir and \
+                            entry.is_file(follow_symlinks=follow_symlinks)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        chain = ancestors
+                        if follow_symlinks:
+                            try:
+                                status = entry.stat()
+                            except OSError:
+                                continue
+                            key = (status.st_dev, status.st_ino)
+                            if key in ancestors:
+                                continue
+                            chain = ancestors | {key}
+                        children.append((entry.path, chain))
+                        if not dirs:
+                            continue
+                    elif not is_file or not files:
+                        continue
+                    if extension is not None and \
+                            not entry.name.endswith(extension):
+                        continue
+                    if pattern is not None and \
+                            not fnmatch.fnmatch(entry.name, pattern):
+                        continue
+                    if not is_dir and (min_size is not None or
+                                       max_size is not None):
+                        try:
+                            size = entry.stat(
+                                follow_symlinks=follow_symlinks).st_size
+                        except OSError:
+                            continue
+                        if min_size is not None and size < min_size:
+                            continue
+                        if max_size is not None and size > max_size:
+                            continue
+                    yield entry
+            pending.extend(reversed(children))
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _bulk_copy(cls, files: List[Tuple[str, str]],
+                   directories: List[Tuple[str, str]], workers: int = 1,
+                   progress: Callable[[int, int], None] = None) -> None:
+        """
+
+        :param files: A list of tuples containing the source and destination
+                      of each file to be copied
+        :param directories: A list of tuples containing the source and
+                            destination of each directory tree to be copied
+        :param workers: The number of files copied at the same time
+        :param progress: A function called as ``progress(copied, total)``
+                         each time a file has been copied
+        :return None:
+
+        This function copies files and directory trees with a pool of
+        threads.  The directories of every tree are created first, in the
+        order they are found, so that a directory always exists before any
+        file is copied into it.  The file data is copied with
+        ``_kernel_copy``.
+        """
+        jobs = list(files)
+        created = []
+        for source, destination in directories:
+            os.makedirs(destination)
+            created.append((source, destination))
+            for entry in cls.walk_directory(source, dirs=True,
+                                            follow_symlinks=True):
+                target = os.path.join(destination,
+                                      os.path.relpath(entry.path, source))
+                if entry.is_dir():
+                    os.mkdir(target)
+                    created.append((entry.path, target))
+                else:
+                    jobs.append((entry.path, target))
+        copied = 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = [executor.submit(cls._copy_with_metadata, source,
+                                       destination)
+                       for source, destination in jobs]
+            for future in as_completed(futures):
+                future.result()
+                copied += 1
+                if progress is not None:
+                    progress(copied, len(jobs))
+
+        # Directory times are copied last, since copying files into a
+        # directory updates its modification time
+        for source, destination in reversed(created):
+            shutil.copystat(source, destination)
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _copy_with_metadata(cls, source: str, destination: str) -> None:
+        """
+
+        :param source: The name and path-link of the file to be copied
+        :param destination: The name and path-link for the file copy
+        :return None:
+
+        This function copies the data of a file with ``_kernel_copy`` and
+        then copies its permission bits and time stamps, in the same manner
+        as ``shutil.copy2``.
+        """
+        cls._kernel_copy(source, destination)
+        shutil.copystat(source, destination)
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _count_patterns(cls, file_name: str, expressions: List[str],
+                        flags: int, regex: bool, chunk_size: int) -> Counter:
+        """
+
+        :param file_name: The file name to include the path-link
+        :param expressions: The regular expressions of the patterns, or a
+                            single expression combining all of the keywords
+        :param flags: The flags used to compile the expressions
+        :param regex: `True` if each expression is a separate pattern,
+                      `False` if the expression is made of keywords
+        :param chunk_size: The number of characters read at a time
+        :return counts: A Counter of the matches of each pattern, keyed by
+                        the pattern or by the keyword
+
+        This function searches a file for ``count_patterns_in_files``.  Each
+        block read from the file is cut at its last new line, and the
+        incomplete line is carried over to the start of the next block.
+        """
+        compiled = [re.compile(expression, flags)
+                    for expression in expressions]
+        counts = Counter()
+        remainder = ''
+        with open(file_name, 'rt', newline='') as file:
+            for chunk in iter(lambda: file.read(chunk_size), ''):
+                text = remainder + chunk
+                end = text.rfind('\n') + 1
+                remainder = text[end:]
+                cls._tally_patterns(counts, compiled, text[:end], flags, regex)
+        cls._tally_patterns(counts, compiled, remainder, flags, regex)
+        return counts
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _file_hash(cls, file_name: str, block_size: int = 1 << 20,
+                   algorithm: str = 'blake2b', partial: bool = False) -> str:
+        """
+
+        :param file_name: The name and path-link of the file to be hashed
+        :param block_size: The number of bytes read at a time, defaulted to
+                           1 MB
+        :param algorithm: The name of a ``hashlib`` algorithm, or
+                          ``'xxhash'``.  Defaulted to ``'blake2b'``
+        :param partial: `True` if only the first and last
+                        ``PARTIAL_HASH_BLOCK`` bytes of the file are hashed,
+                        `False` if the entire file is hashed.  Defaulted to
+                        `False`
+        :return digest: The hexadecimal digest of the file contents
+
+        This function hashes the contents of a file in fixed size blocks,
+        so that files of any size are hashed in constant memory.
+        """
+        if algorithm == 'xxhash':
+            digest = xxhash.xxh3_128()
+        else:
+            digest = hashlib.new(algorithm)
+        with open(file_name, 'rb') as file:
+            if partial:
+                digest.update(file.read(PARTIAL_HASH_BLOCK))
+                if os.fstat(file.fileno()).st_size > PARTIAL_HASH_BLOCK:
+                    file.seek(-PARTIAL_HASH_BLOCK, os.SEEK_END)
+                    digest.update(file.read(PARTIAL_HASH_BLOCK))
+            else:
+                for block in iter(lambda: file.read(block_size), b''):
+                    digest.update(block)
+        return digest.hexdigest()
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _hash_groups(cls, groups: List[List[str]], files: Dict[str, list],
+                     slot: int, workers: int,
+                     function: Callable[[str], str]) -> List[List[str]]:
+        """
+
+        :param groups: A list of groups of paths to files that may be
+                       identical
+        :param files: A dictionary of the size, modification time, partial
+                      hash and full hash of each file, keyed by path, which
+                      is updated with the computed hashes
+        :param slot: The position of the hash in the records of ``files``
+        :param workers: The number of files hashed at the same time
+        :param function: The function that hashes a file
+        :return groups: A list of the groups of paths whose hashes match,
+                        without groups containing a single file
+
+        This function divides groups of candidate duplicates for
+        ``find_duplicates`` by hash, only computing the hashes that are not
+        already known.
+        """
+        missing = [path for paths in groups for path in paths
+                   if files[path][slot] is None]
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for path, digest in zip(missing, executor.map(function, missing)):
+                files[path][slot] = digest
+        matches = []
+        for paths in groups:
+            divided = {}
+            for path in paths:
+                divided.setdefault(files[path][slot], []).append(path)
+            matches.extend(group for group in divided.values()
+                           if len(group) > 1)
+        return matches
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _kernel_copy(cls, source: str, destination: str) -> str:
+        """
+
+        :param source: The name and path-link of the file to be copied
+        :param destination: The name and path-link for the file copy
+        :return method: The mechanism that copied the data, ``'reflink'``,
+                        ``'copy_file_range'``, ``'sendfile'`` or
+                        ``'userspace'``
+
+        This function copies the data of a file with the fastest mechanism
+        available, falling back to the next mechanism when one is not
+        supported by the platform or the file systems involved.
+        """
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            in_fd = src.fileno()
+            out_fd = dst.fileno()
+            size = os.fstat(in_fd).st_size
+            if fcntl is not None and sys.platform.startswith('linux'):
+                try:
+                    fcntl.ioctl(out_fd, FICLONE, in_fd)
+                    return 'reflink'
+                except OSError:
+                    pass
+            if hasattr(os, 'copy_file_range'):
+                copied = 0
+                try:
+                    while True:
+                        sent = os.copy_file_range(in_fd, out_fd,
+                                                  max(size - copied, 1 << 20))
+                        if sent == 0:
+                            break
+                        copied += sent
+                    return 'copy_file_range'
+                except OSError as error:
+                    if copied or error.errno not in _UNSUPPORTED_COPY:
+                        raise
+            if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+                copied = 0
+                try:
+                    while True:
+                        sent = os.sendfile(out_fd, in_fd, copied,
+                                           max(size - copied, 1 << 20))
+                        if sent == 0:
+                            break
+                        copied += sent
+                    dst.seek(copied)
+                    return 'sendfile'
+                except OSError as error:
+                    if copied or error.errno not in _UNSUPPORTED_COPY:
+                        raise
+            shutil.copyfileobj(src, dst, 1 << 20)
+        return 'userspace'
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _keyword_trie(cls, keywords: List[str]) -> str:
+        """
+
+        :param keywords: A list of the keywords to be matched
+        :return pattern: A regular expression that matches any one of the
+                         keywords
+
+        This function builds a prefix tree of the keywords and writes it as
+        a regular expression of nested groups, so that ``file``, ``files``
+        and ``find`` are written as ``fi(?:le(?:s)?|nd)``.  Every
+        optional group is greedy, so the longest keyword at a position is
+        tried first, and a shorter keyword is only matched when the longer
+        one is not followed by a word boundary.
+        """
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def render(node: dict) -> str:
+            leaves = []
+            branches = []
+            for char in sorted(key for key in node if key):
+                child = render(node[char])
+                if child:
+                    branches.append(re.escape(char) + child)
+                else:
+                    leaves.append(re.escape(char))
+            if len(leaves) == 1:
+                branches.append(leaves[0])
+            elif leaves:
+                branches.append('[{}]'.format(''.join(leaves)))
+            if not branches:
+                return ''
+            if '' not in node and len(branches) == 1:
+                return branches[0]
+            group = '(?:{})'.format('|'.join(branches))
+            return group + '?' if '' in node else group
+        return render(trie)
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _read_words(cls, file_name: str,
+                    chunk_size: int = 1 << 20) -> Iterator[Tuple[str, List[str]]]:
+        """
+
+        :param file_name: The file name to include the path link
+        :param chunk_size: The number of characters read at a time,
+                           defaulted to 1048576
+        :return blocks: A generator of tuples containing each block of the
+                        file and a list of the words in the block
+
+        This function splits a file into white space separated words one
+        block at a time.  When a block does not end in white space its last
+        word may continue in the next block, so it is held back and joined
+        to the start of the next block rather than returned.  Line endings
+        are not translated, so each line of the file contains exactly one
+        ``\\n`` character.
+        """
+        remainder = ''
+        with open(file_name, 'rt', newline='') as file:
+            for chunk in iter(lambda: file.read(chunk_size), ''):
+                tokens = (remainder + chunk).split()
+                remainder = ''
+                if tokens and not chunk[-1].isspace():
+                    remainder = tokens.pop()
+                yield chunk, tokens
+        if remainder:
+            yield '', [remainder]
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _scan_usage(cls, directory: str, parent: str = None,
+                    cache: dict = None, recursive: bool = True) -> list:
+        """
+
+        :param directory: The directory to be measured
+        :param parent: The directory that contains ``directory``
+        :param cache: A dictionary of the contents of each directory, keyed
+                      by path, which is read and updated
+        :param recursive: `True` if sub-directories are measured, `False`
+                          if only ``directory`` itself is listed
+        :return records: A list with a tuple for each directory containing
+                         its path, its parent, the size of the files it
+                         contains that have a single link, a list of the
+                         device, inode and size of files with several links,
+                         and a list of its sub-directories
+
+        This function lists the directories of a tree for
+        ``directory_usage``, with each directory recorded before any of its
+        sub-directories.  A directory is only listed again when its
+        modification time differs from the one stored in ``cache``.
+        Directories that can not be read are recorded as empty.
+        """
+        records = []
+        pending = [(directory, parent)]
+        while pending:
+            path, above = pending.pop()
+            try:
+                modified = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            stored = cache.get(path) if cache is not None else None
+            if stored is not None and stored[0] == modified:
+                _, size, linked, children = stored
+            else:
+                size = 0
+                linked = []
+                children = []
+                try:
+                    with os.scandir(path) as scanner:
+                        for entry in scanner:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    children.append(entry.path)
+                                    continue
+                                status = entry.stat(follow_symlinks=False)
+                            except OSError:
+                                continue
+                            if status.st_nlink > 1:
+                                linked.append((status.st_dev, status.st_ino,
+                                               status.st_size))
+                            else:
+                                size += status.st_size
+                except OSError:
+                    pass
+                if cache is not None:
+                    cache[path] = (modified, size, linked, children)
+            records.append((path, above, size, linked, children))
+            if recursive:
+                pending.extend((child, path) for child in reversed(children))
+        return records
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _sync_file(cls, source: str, destination: str,
+                   status: os.stat_result, checksum: bool) -> bool:
+        """
+
+        :param source: The name and path-link of the source file
+        :param destination: The name and path-link of the mirrored file
+        :param status: The result of ``stat`` for the source file
+        :param checksum: `True` if files of the same size are compared by
+                         hash, `False` if they are compared by modification
+                         time
+        :return copied: `True` if the file was copied, `False` if the
+                        mirrored file was already up to date
+        """
+        if os.path.isdir(destination) and not os.path.islink(destination):
+            shutil.rmtree(destination)
+        try:
+            current = os.stat(destination)
+        except OSError:
+            current = None
+        if current is not None and current.st_size == status.st_size:
+            if checksum:
+                if cls._file_hash(source) == cls._file_hash(destination):
+                    if int(current.st_mtime) != int(status.st_mtime):
+                        shutil.copystat(source, destination)
+                    return False
+            elif int(current.st_mtime) == int(status.st_mtime):
+                return False
+        cls._copy_with_metadata(source, destination)
+        return True
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _tally_patterns(cls, counts: Counter, compiled: List[re.Pattern],
+                        text: str, flags: int, regex: bool) -> None:
+        """
+
+        :param counts: A Counter of the matches of each pattern, which is
+                       updated in place
+        :param compiled: The compiled regular expressions of the patterns,
+                         or a single expression combining all of the keywords
+        :param text: The text to be searched
+        :param flags: The flags used to compile the expressions
+        :param regex: `True` if each expression is counted separately under
+                      its own pattern, `False` if matches are identified by
+                      the matched keyword
+        :return None:
+        """
+        if not text:
+            return
+        if regex:
+            for expression in compiled:
+                counts[expression.pattern] += sum(
+                    1 for _ in expression.finditer(text))
+        elif flags & re.IGNORECASE:
+            counts.update(match.lower()
+                          for match in compiled[0].findall(text))
+        else:
+            counts.update(compiled[0].findall(text))
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _tally_words(cls, counts: Dict[str, int], tokens: List[str]) -> None:
+        """
+
+        :param counts: A dictionary of the number of occurrences of each
+                       word, which is updated in place
+        :param tokens: A list of the words read from a file
+        :return None:
+
+        This function adds the occurrences of each word in ``counts`` to
+        its count, treating a word followed by a comma or a period as an
+        occurrence of the word.
+        """
+        found = Counter(tokens)
+        for word in counts:
+            counts[word] += found[word] + found[word + ','] + found[word + '.']
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _text_stats(cls, file_name: str, words: List[str]) -> dict:
+        """
+
+        :param file_name: The file name to include the path-link
+        :param words: A list of words whose occurrences are counted
+        :return stats: A dictionary containing the ``'lines'``, ``'words'``,
+                       ``'bytes'`` and word ``'occurrences'`` of the file
+
+        This function reads a file once for ``text_stats``.  It is run in
+        the worker processes, so it must be reachable from the class by
+        name in order to be pickled.
+        """
+        lines = 0
+        total = 0
+        last = ''
+        counts = dict.fromkeys(words, 0)
+        for chunk, tokens in cls._read_words(file_name):
+            if chunk:
+                lines += chunk.count('\n')
+                last = chunk[-1]
+            total += len(tokens)
+            cls._tally_words(counts, tokens)
+        if last and last != '\n':
+            lines += 1
+        return {'lines': lines, 'words': total,
+                'bytes': os.stat(file_name).st_size, 'occurrences': counts}
+# ----------------------------------------------------------------------------
+
+    @classmethod
+    def _classify_entries(cls, directory: str,
+                          extension: str = 'NULL') -> Tuple[List[str], List[str]]:
+        """
+
+        :param directory: The directory to be listed to include the path-link
+        :param extension: A file extension such as `.txt` or `.csv`
+        :return files: The names of the files in the directory
+        :return directories: The names of the directories in the directory
+
+        This function lists a directory in a single pass with
+        ``os.scandir`` and separates the files from the directories with
+        the entry type reported by the directory listing, which does not
+        require an additional ``stat`` call for each entry on most
+        platforms.
+        """
+        files = []
+        directories = []
+        with os.scandir(directory) as scanner:
+            for entry in scanner:
+                if extension != 'NULL' and not entry.name.endswith(extension):
+                    continue
+                if entry.is_dir():
+                    directories.append(entry.name)
+                else:
+                    files.append(entry.name)
+        return files, directories
+# ============================================================================
+# ============================================================================
+
+
+class FileIndex:
+    """
+
+    :param database: The SQLite database that stores the index to include
+                     its path-link.  The database is created if it does not
+                     exist
+    :param directory: The directory tree that is indexed to include its
+                      path-link, defaulted to the current working directory
+    :param hashes: True if the BLAKE2 hash of the contents of each file is
+                   stored, False otherwise.  Defaulted to False
+
+    This class keeps a record of every file in a directory tree in the
+    ``files`` table of a SQLite database, containing the path, name,
+    extension, size in bytes, modification time, inode, device and
+    optionally the hash of each file.  The tree is searched with
+    ``OSUtilities.walk_directory`` and the table is managed through
+    ``ManageSQLiteDB``.  Once the index is built, questions about the tree
+    are answered by queries on the database rather than by searching the
+    file system again, and ``update`` brings the index up to date by only
+    writing the files whose size, modification time or inode have changed.
+    Symbolic links are not indexed, and each database should index a single
+    directory tree.
+
+    .. code-block:: python
+
+       > with FileIndex('data_index.db', '/mnt/share/data') as index:
+       >     print(index.update(workers=8))
+       {'added': 182014, 'modified': 0, 'removed': 0, 'unchanged': 0}
+       >     large = index.find(extension='.csv', min_size=1024 ** 3)
+       >     recent = index.changed_since(datetime(2021, 3, 14))
+
+    Since the ``files`` table is an ordinary SQLite table it can also be
+    queried directly with ``index.db.query_db``.
+    """
+    def __init__(self, database: str, directory: str = '.',
+                 hashes: bool = False):
+        self.directory = directory
+        self.hashes = hashes
+        # Imported here so that OSUtilities does not load pandas and sqlite3
+        from core_utilities.read_files import ManageSQLiteDB
+        self.db = ManageSQLiteDB(database, create=True)
+        self.db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY '
+                        'KEY, name TEXT, extension TEXT, size INTEGER, '
+                        'mtime REAL, inode INTEGER, device INTEGER, '
+                        'hash TEXT);')
+        self.db.execute('CREATE INDEX IF NOT EXISTS idx_files_extension_size '
+                        'ON files (extension, size);')
+        self.db.execute('CREATE INDEX IF NOT EXISTS idx_files_mtime '
+                        'ON files (mtime);')
+# ----------------------------------------------------------------------------
+
+    def __enter__(self) -> 'FileIndex':
+        return self
+# ----------------------------------------------------------------------------
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close_database_connection()
+# ----------------------------------------------------------------------------
+
+    def changed_since(self, since: Union[datetime, float]) -> 'pd.DataFrame':
+        """
+
+        :param since: A datetime, or a time in seconds since the epoch
+        :return files: A dataframe of the indexed files modified at or after
+                       ``since``, ordered by modification time
+
+        This function returns the files that have changed since a point in
+        time, as of the last call to ``update``.  The ``mtime`` column is
+        in seconds since the epoch.
+
+        .. code-block:: python
+
+           > index = FileIndex('data_index.db', '/mnt/share/data')
+           > yesterday = datetime.now() - timedelta(days=1)
+           > print(index.changed_since(yesterday)[['path', 'size']])
+                                         path    size
+           0  /mnt/share/data/logs/server.log  104857
+        """
+        if isinstance(since, datetime):
+            since = since.timestamp()
+        return self.db.query_db('SELECT * FROM files WHERE mtime >= ? '
+                                'ORDER BY mtime;', (since,))
+# ----------------------------------------------------------------------------
+
+    def close_database_connection(self) -> None:
+        """
+        This function closes the connection to the index database.
+        """
+        self.db.close_database_connection()
+# ----------------------------------------------------------------------------
+
+    def find(self, extension: str = None, pattern: str = None,
+             min_size: int = None, max_size: int = None) -> 'pd.DataFrame':
+        """
+
+        :param extension: A file extension such as `.txt` or `.csv`,
+                          defaulted to None
+        :param pattern: A glob style pattern such as `data_*.csv` that the
+                        file names must match, defaulted to None
+        :param min_size: The minimum file size in bytes, defaulted to None
+        :param max_size: The maximum file size in bytes, defaulted to None
+        :return files: A dataframe of the indexed files that pass every
+                       filter, ordered by path
+
+        This function searches the index, as of the last call to
+        ``update``, in the same manner as ``OSUtilities.walk_directory``
+        searches the file system.
+
+        .. code-block:: python
+
+           > index = FileIndex('data_index.db', '/mnt/share/data')
+           > large = index.find(extension='.csv', min_size=1024 ** 3)
+        """
+        clauses = []
+        params = []
+        for clause, value in (('extension = ?', extension),
+                              ('name GLOB ?', pattern),
+                              ('size >= ?', min_size),
+                              ('size <= ?', max_size)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        query = 'SELECT * FROM files'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        return self.db.query_db(query + ' ORDER BY path;', tuple(params))
+# ----------------------------------------------------------------------------
+
+    def update(self, workers: int = 4) -> Dict[str, int]:
+        """
+
+        :param workers: The number of files hashed at the same time,
+                        defaulted to 4
+        :return counts: A dictionary containing the number of files
+                        ``'added'``, ``'modified'``, ``'removed'`` and
+                        ``'unchanged'`` since the last update
+
+        This function searches the directory tree and compares the size,
+        modification time and inode of each file with the values stored in
+        the index.  Only new and changed files are written to the index,
+        and only those files are hashed when ``hashes`` is True.  Files
+        that are no longer in the tree are removed from the index.  The
+        first call builds the entire index.
+
+        .. code-block:: python
+
+           > index = FileIndex('data_index.db', '/mnt/share/data',
+                               hashes=True)
+           > print(index.update())
+           {'added': 12, 'modified': 3, 'removed': 1, 'unchanged': 182010}
+        """
+        stored = {}
+        for rows in self.db.iterate_query('SELECT path, size, mtime, inode, '
+                                          'hash FROM files;', output='tuple'):
+            for path, size, mtime, inode, digest in rows:
+                stored[path] = (size, mtime, inode, digest)
+
+        counts = {'added': 0, 'modified': 0, 'removed': 0, 'unchanged': 0}
+        changed = []
+        for entry in OSUtilities.walk_directory(self.directory):
+            if entry.is_symlink():
+                continue
+            status = entry.stat(follow_symlinks=False)
+            record = (status.st_size, status.st_mtime, status.st_ino)
+            previous = stored.pop(entry.path, None)
+            if previous is None:
+                counts['added'] += 1
+            elif previous[:3] != record:
+                counts['modified'] += 1
+            else:
+                counts['unchanged'] += 1
+                if previous[3] is not None or not self.hashes:
+                    continue
+            changed.append([entry.path, entry.name,
+                            os.path.splitext(entry.name)[1], status.st_size,
+                            status.st_mtime, status.st_ino, status.st_dev,
+                            None])
+
+        if self.hashes and changed:
+            paths = [row[0] for row in changed]
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                for row, digest in zip(changed, executor.map(
+                        OSUtilities._file_hash, paths)):
+                    row[7] = digest
+        if changed:
+            columns = ['path', 'name', 'extension', 'size', 'mtime', 'inode',
+                       'device', 'hash']
+            self.db.insert_data('files', changed, columns,
+                                upsert_keys=['path'])
+        if stored:
+            with self.db.conn:
+                self.db.conn.executemany('DELETE FROM files WHERE path = ?;',
+                                         ((path,) for path in stored))
+            counts['removed'] = len(stored)
+        return counts
 # ============================================================================
 # ============================================================================
 # eof
@@ -3,8 +3,20 @@ import os
 import sys
 import numpy as np
 import pandas as pd
-from typing import List
+from typing import List, Union, Dict, Tuple, Iterator, Iterable, Hashable
 import sqlite3
+import re
+import time
+import asyncio
+import threading
+import glob
+import pathlib
+import csv
+import weakref
+import warnings
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import Counter, OrderedDict
+from itertools import islice, repeat, count as counter
 # ============================================================================
 # ============================================================================
 # Date:    December 10, 2020
@@ -1092,34 +1104,620 @@ def read_excel_columns_by_index(file_name: str, tab: str, col_index: List[int],
 # ============================================================================
 
 
+SQLITE_PROFILES = {
+    'read_heavy': {'journal_mode': 'WAL', 'synchronous': 'NORMAL',
+                   'cache_size': -65536, 'mmap_size': 268435456,
+                   'temp_store': 'MEMORY'},
+    'bulk_load': {'journal_mode': 'WAL', 'synchronous': 'OFF',
+                  'cache_size': -262144, 'mmap_size': 268435456,
+                  'temp_store': 'MEMORY'},
+    'safe': {'journal_mode': 'DELETE', 'synchronous': 'FULL',
+             'cache_size': -2000, 'mmap_size': 0,
+             'temp_store': 'DEFAULT'}
+}
+# ----------------------------------------------------------------------------
+
+
 class ManageSQLiteDB:
     """
 
     :param database: The database name to include its path-link
+    :param cached_statements: The number of prepared statements the
+                              connection keeps in its statement cache.
+                              Defaulted to 128
+    :param profile: The name of a pragma profile in ``SQLITE_PROFILES``
+                    applied to the connection when it is opened.  Defaulted
+                    to None, which keeps the SQLite defaults
+    :param check_same_thread: True if the connection may only be used by
+                              the thread that created it, False otherwise.
+                              Defaulted to True
+    :param mode: The way the database is opened, ``'rw'``, ``'ro'``,
+                 ``'immutable'`` or ``'memory'``.  Defaulted to ``'rw'``
+    :param create: True if an empty database is created when ``database``
+                   does not exist, False otherwise.  Only used with the
+                   ``'rw'`` mode and defaulted to False
 
     This class allows users to interface with SQLite databases, open the
-    database, close the database and input queries.
+    database, close the database and input queries.  Queries that are
+    executed repeatedly with different values should pass those values
+    as parameters rather than formatting them into the query string, so
+    that the prepared statement can be reused from the statement cache
+    instead of being re-parsed by SQLite on every call.  Applications
+    that cycle through more distinct statements than the default cache
+    holds can increase ``cached_statements``.
+
+    .. code-block:: python
+
+       > db = ManageSQLiteDB('../data/test/Maintenance.db',
+                             cached_statements=256)
+
+    The connection can also be tuned for a particular workload with one
+    of the pragma profiles described in ``apply_profile``.
+
+    .. code-block:: python
+
+       > db = ManageSQLiteDB('../data/test/Maintenance.db',
+                             profile='read_heavy')
+
+    Databases that are only read can be opened in one of the following
+    modes.  The ``'ro'`` and ``'immutable'`` modes reject statements that
+    modify the database, while the ``'memory'`` mode accepts them but never
+    saves them to the file.
+
+    * ``'ro'``: The database is opened read-only, while other connections
+      may still write to it.
+    * ``'immutable'``: The database is opened read-only and SQLite is told
+      that the file will not change while it is open, which removes all
+      file locking and change detection.  This mode must only be used for
+      files that no other process will modify.
+    * ``'memory'``: The database is copied into an in-memory database with
+      the SQLite backup API and the file is closed, so every query is served
+      from RAM.  The copy is a writable snapshot that does not see later
+      changes to the file, and changes made to the copy are never saved
+      back to the file.
+
+    .. code-block:: python
+
+       > db = ManageSQLiteDB('../data/test/Maintenance.db', mode='memory')
+
+    The class can be used as a context manager, which closes the connection
+    when the block exits, even if an exception is raised.  Every open
+    connection is also recorded in a registry that can be inspected with
+    ``open_sqlite_connections`` to find connections that are never closed.
+    A connection that is garbage collected without being closed is closed
+    at that point and a ``ResourceWarning`` is issued.
+
+    .. code-block:: python
+
+       > with ManageSQLiteDB('../data/test/Maintenance.db') as db:
+       >     df = db.query_db("SELECT Date, Cost FROM gas;")
     """
-    def __init__(self, database: str):
+    def __init__(self, database: str, cached_statements: int = 128,
+                 profile: str = None, check_same_thread: bool = True,
+                 mode: str = 'rw', create: bool = False):
         self.database = database
-        if not os.path.isfile(self.database):
+        self.mode = mode
+        if not os.path.isfile(self.database) and not (create and mode == 'rw'):
             sys.exit('{}{}{}'.format('FATAL ERROR: ',
                                      self.database, ' does not exist'))
-        self.conn = sqlite3.connect(self.database)
+        if mode not in ('rw', 'ro', 'immutable', 'memory'):
+            sys.exit('{}{}{}'.format('FATAL ERROR: ', mode,
+                                     ' is not a valid mode'))
+        if mode == 'rw':
+            self.conn = sqlite3.connect(self.database,
+                                        cached_statements=cached_statements,
+                                        check_same_thread=check_same_thread)
+        else:
+            uri = pathlib.Path(self.database).resolve().as_uri()
+            uri += '?immutable=1' if mode == 'immutable' else '?mode=ro'
+            self.conn = sqlite3.connect(uri, uri=True,
+                                        cached_statements=cached_statements,
+                                        check_same_thread=check_same_thread)
+        if mode == 'memory':
+            source = self.conn
+            self.conn = sqlite3.connect(':memory:',
+                                        cached_statements=cached_statements,
+                                        check_same_thread=check_same_thread)
+            try:
+                source.backup(self.conn)
+            finally:
+                source.close()
+        self._result_cache = None
+        self.profiler = None
+        self.advisor = None
+        self._key = _register_connection(self)
+        self._finalizer = weakref.finalize(self, _collect_connection,
+                                           self._key, self.database,
+                                           self.conn)
+        self._finalizer.atexit = False
+        if profile is not None:
+            self.apply_profile(profile)
+# ----------------------------------------------------------------------------
+
+    def __enter__(self) -> 'ManageSQLiteDB':
+        return self
+# ----------------------------------------------------------------------------
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close_database_connection()
+# ----------------------------------------------------------------------------
+
+    def apply_profile(self, profile: str) -> None:
+        """
+
+        :param profile: The name of a profile in ``SQLITE_PROFILES``
+        :return None:
+
+        This function applies a named set of performance pragmas to the
+        connection.  The following profiles are available.
+
+        * ``'read_heavy'``: Write-ahead logging so readers are never blocked
+          by a writer, ``synchronous=NORMAL``, a 64 MB page cache, 256 MB of
+          memory mapped I/O and temporary tables held in memory.  Intended
+          for read-mostly analytics databases.
+        * ``'bulk_load'``: Write-ahead logging with ``synchronous=OFF``, a
+          256 MB page cache, memory mapped I/O and in-memory temporary
+          tables.  Intended for large loads that can be repeated if the
+          machine loses power part way through.
+        * ``'safe'``: The rollback journal with ``synchronous=FULL`` and the
+          SQLite default cache and temporary storage.
+
+        Write-ahead logging is a persistent property of the database file,
+        while the remaining pragmas only last for the life of the connection.
+        The journal mode is therefore left unchanged for connections that
+        are not opened in the ``'rw'`` mode.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > db.apply_profile('bulk_load')
+           > db.insert_data('gas', rows, columns)
+           > db.apply_profile('safe')
+        """
+        if profile not in SQLITE_PROFILES:
+            sys.exit('{}{}{}'.format('FATAL ERROR: ', profile,
+                                     ' is not a valid profile'))
+        for pragma, value in SQLITE_PROFILES[profile].items():
+            if pragma == 'journal_mode' and self.mode != 'rw':
+                continue
+            self._set_pragma(pragma, value)
 # ----------------------------------------------------------------------------
 
     def close_database_connection(self) -> None:
         """
-        This function closes a database connection
+        This function closes a database connection.  Closing a connection
+        that is already closed has no effect.
         """
-        self.conn.close()
+        if self._finalizer.detach() is not None:
+            _release_connection(self._key, self.conn)
         return
 # ----------------------------------------------------------------------------
 
-    def query_db(self, query: str) -> pd.DataFrame:
+    def disable_index_advisor(self) -> None:
+        """
+        This function stops collecting queries for the index advisor
+        """
+        self.advisor = None
+# ----------------------------------------------------------------------------
+
+    def disable_profiling(self) -> None:
+        """
+        This function stops recording the queries passed to ``query_db``
+        """
+        self.profiler = None
+# ----------------------------------------------------------------------------
+
+    def disable_result_cache(self) -> None:
+        """
+        This function disables the query result cache and releases all
+        of the results it holds
+        """
+        self._result_cache = None
+# ----------------------------------------------------------------------------
+
+    def enable_result_cache(self, max_entries: int = 128,
+                            ttl: float = None) -> None:
+        """
+
+        :param max_entries: The maximum number of query results held in the
+                            cache.  The least recently used result is
+                            evicted when the cache is full.  Defaulted to 128
+        :param ttl: The number of seconds a result remains valid after it
+                    is cached.  Defaulted to None, which keeps results until
+                    they are evicted or invalidated
+        :return None:
+
+        This function enables a cache of ``query_db`` results keyed on the
+        query text and its parameters, so that dashboards and reports that
+        repeat the same queries do not re-read unchanged data.  The entire
+        cache is invalidated whenever the data in the database may have
+        changed, which is detected through ``PRAGMA data_version`` for
+        commits made by other connections, the number of changes made by this
+        connection and the modification time of the database file.  Every
+        call receives its own copy of a cached dataframe, so modifying a
+        result does not alter the cache.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > db.enable_result_cache(max_entries=64, ttl=300.0)
+           > query = "SELECT Date, Cost FROM gas WHERE State = ?;"
+           > df = db.query_db(query, ('Utah',))  # read from the database
+           > df = db.query_db(query, ('Utah',))  # served from the cache
+           > print(db.result_cache_info())
+           {'hits': 1, 'misses': 1, 'entries': 1}
+        """
+        self._result_cache = _ResultCache(max_entries, ttl)
+# ----------------------------------------------------------------------------
+
+    def enable_index_advisor(self) -> 'IndexAdvisor':
+        """
+
+        :return advisor: The ``IndexAdvisor`` that collects the queries
+
+        This function enables an ``IndexAdvisor`` that collects every query
+        passed to ``query_db``.  Once a representative workload has been
+        executed the advisor recommends, and can optionally create, the
+        indexes that would remove the full table scans in that workload.
+        The advisor is also available as the ``advisor`` attribute of the
+        class.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > advisor = db.enable_index_advisor()
+           > query = "SELECT Date, Cost FROM gas WHERE State = ? ORDER BY Date;"
+           > df = db.query_db(query, ('Utah',))
+           > print(advisor.recommend()['statement'][0])
+           CREATE INDEX IF NOT EXISTS "idx_gas_State_Date" ON "gas" ("State", "Date")
+        """
+        self.advisor = IndexAdvisor(self)
+        return self.advisor
+# ----------------------------------------------------------------------------
+
+    def enable_profiling(self, threshold: float = 0.1) -> 'QueryProfiler':
+        """
+
+        :param threshold: The execution time in seconds at or above which a
+                          query is considered slow.  Defaulted to 0.1
+        :return profiler: The ``QueryProfiler`` that records the queries
+
+        This function enables the instrumentation of ``query_db``.  Every
+        query records its wall time, the number of rows returned, the
+        number of bytes in the resulting dataframe and whether it was served
+        from the result cache.  Queries that are slower than ``threshold``
+        also record the output of ``EXPLAIN QUERY PLAN`` and whether that
+        plan scans an entire table.  The profiler is also available as the
+        ``profiler`` attribute of the class.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > profiler = db.enable_profiling(threshold=0.05)
+           > df = db.query_db("SELECT Date, Cost FROM gas WHERE Cost > ?;",
+                              (25.0,))
+           > print(profiler.summary())
+           > for record in profiler.slow_queries():
+           >     print(record['query'], record['seconds'], record['plan'])
+        """
+        self.profiler = QueryProfiler(threshold)
+        return self.profiler
+# ----------------------------------------------------------------------------
+
+    def execute(self, statement: str, params: Union[Tuple, Dict] = None) -> int:
+        """
+
+        :param statement: A SQLite statement that does not return rows,
+                          such as ``CREATE INDEX``, ``UPDATE`` or ``DELETE``
+        :param params: The values bound to the placeholders in the
+                       statement, defaulted to None
+        :return count: The number of rows modified by the statement, or -1
+                       for statements that do not modify rows
+
+        This function executes a single statement and commits it.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > db.execute("UPDATE gas SET Octane = ? WHERE event_id = ?;", (87, 2))
+           1
+           > db.close_database_connection()
+        """
+        with self.conn:
+            cursor = self.conn.execute(statement,
+                                       () if params is None else params)
+        return cursor.rowcount
+# ----------------------------------------------------------------------------
+
+    def export_query(self, query: str, file_name: str,
+                     file_format: str = 'parquet',
+                     params: Union[Tuple, Dict] = None,
+                     chunk_size: int = 100000) -> int:
         """
 
         :param query: A SQLite query statement
+        :param file_name: The name of the output file to include the
+                          path-link
+        :param file_format: The format of the output file, ``'parquet'``,
+                            ``'csv'`` or ``'npy'``.  Defaulted to
+                            ``'parquet'``
+        :param params: The values bound to the placeholders in the query,
+                       defaulted to None
+        :param chunk_size: The number of rows read from the cursor and
+                           written to the file at a time, defaulted to 100000
+        :return count: The number of rows written to the file
+
+        This function writes the results of a query directly to a file,
+        streaming batches of rows from the cursor to the output without
+        building a dataframe, so the memory used is bounded by
+        ``chunk_size`` regardless of the size of the result.
+
+        * ``'csv'``: A comma separated file with a header row.  NULL values
+          are written as empty fields.
+        * ``'parquet'``: A parquet file with one row group per batch.  This
+          format requires the ``pyarrow`` package.  Integer columns that
+          contain NULL values remain integer columns with NULL values.
+        * ``'npy'``: A numpy structured array with one field per column that
+          can be loaded with ``numpy.load`` or memory mapped with
+          ``numpy.load(file_name, mmap_mode='r')``.  Integer columns that
+          contain NULL values are stored as floating point numbers with NULL
+          values stored as ``nan``, and text columns are stored as fixed
+          width strings with NULL values stored as empty strings.
+
+        The parquet and numpy formats need the type of every column, and the
+        numpy format also needs the number of rows, before the first batch
+        is written.  These are determined with an additional aggregate pass
+        of the query in the same read transaction as the export.  Both
+        formats store columns by name, so a query that returns the same
+        column name more than once must give each column its own name with
+        ``AS``.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > query = "SELECT Date, Gallons, Cost FROM gas;"
+           > db.export_query(query, 'gas.parquet')
+           39
+           > db.export_query(query, 'gas.npy', file_format='npy')
+           39
+           > data = np.load('gas.npy', mmap_mode='r')
+           > print(data['Cost'][:3])
+           [27.88 23.75 28.3 ]
+        """
+        if file_format not in ('parquet', 'csv', 'npy'):
+            sys.exit('{}{}{}'.format('FATAL ERROR: ', file_format,
+                                     ' is not a valid file format'))
+        if file_format == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                sys.exit('FATAL ERROR: pyarrow must be installed to export '
+                         'parquet files')
+        count = 0
+        transaction = file_format != 'csv' and not self.conn.in_transaction
+        if transaction:
+            self.conn.execute('BEGIN')
+        cursor = self.conn.execute(query, () if params is None else params)
+        try:
+            names = [description[0] for description in cursor.description]
+            batches = iter(lambda: cursor.fetchmany(chunk_size), [])
+            if file_format == 'csv':
+                with open(file_name, 'w', newline='') as file:
+                    writer = csv.writer(file)
+                    writer.writerow(names)
+                    for batch in batches:
+                        writer.writerows(batch)
+                        count += len(batch)
+                return count
+
+            repeated = [name for name, total in Counter(names).items()
+                        if total > 1]
+            if repeated:
+                sys.exit('{}{}{}'.format('FATAL ERROR: The column names ',
+                                         ', '.join(repeated),
+                                         ' occur more than once in the query'))
+            rows, columns = self._query_column_types(query, names, params)
+            if file_format == 'parquet':
+                types = {'int': pa.int64(), 'float': pa.float64(),
+                         'text': pa.string(), 'blob': pa.binary()}
+                schema = pa.schema([(name, types[kind])
+                                    for name, kind, _, _ in columns])
+                with pq.ParquetWriter(file_name, schema) as writer:
+                    for batch in batches:
+                        arrays = []
+                        for values, field, (_, kind, _, _) in zip(
+                                zip(*batch), schema, columns):
+                            if kind == 'text':
+                                values = [None if value is None else str(value)
+                                          for value in values]
+                            arrays.append(pa.array(values, type=field.type))
+                        writer.write_table(pa.Table.from_arrays(arrays,
+                                                                schema=schema))
+                        count += len(batch)
+            else:
+                types = {'int': 'i8', 'float': 'f8', 'text': 'U', 'blob': 'S'}
+                dtype = [(name, 'f8' if kind == 'int' and nulls else
+                          types[kind] + (str(width) if width else ''))
+                         for name, kind, width, nulls in columns]
+                data = np.lib.format.open_memmap(file_name, mode='w+',
+                                                 dtype=dtype, shape=(rows,))
+                for batch in batches:
+                    end = min(count + len(batch), rows)
+                    for values, (name, kind, _, _) in zip(zip(*batch), columns):
+                        values = values[:end - count]
+                        if kind == 'text':
+                            values = ['' if value is None else str(value)
+                                      for value in values]
+                        elif kind == 'blob':
+                            values = [b'' if value is None else value
+                                      for value in values]
+                        data[name][count:end] = values
+                    count = end
+                data.flush()
+                del data
+        finally:
+            cursor.close()
+            if transaction:
+                self.conn.commit()
+        return count
+# ----------------------------------------------------------------------------
+
+    def insert_data(self, table: str, data: Union[pd.DataFrame, Iterable[Tuple]],
+                    columns: List[str] = None, upsert_keys: List[str] = None,
+                    batch_size: int = 10000, journal_mode: str = None,
+                    synchronous: str = None,
+                    date_format: str = '%Y-%m-%d %H:%M:%S') -> int:
+        """
+
+        :param table: The name of the table receiving the data
+        :param data: A pandas dataframe or an iterable of tuples containing
+                     the rows to be written
+        :param columns: The table columns that correspond to each value in
+                        a row.  Defaulted to the dataframe column names and
+                        required when ``data`` is not a dataframe
+        :param upsert_keys: The columns of a primary key or unique
+                            constraint.  When provided, rows that conflict
+                            with an existing row on these columns update
+                            that row instead of failing.  Defaulted to None
+        :param batch_size: The number of rows handed to ``executemany`` at a
+                           time, defaulted to 10000
+        :param journal_mode: The journal mode used for the load such as
+                             ``'WAL'`` or ``'MEMORY'``.  Defaulted to None,
+                             which leaves the current journal mode in place
+        :param synchronous: The synchronous level used for the load such as
+                            ``'OFF'`` or ``'NORMAL'``.  Defaulted to None,
+                            which leaves the current level in place
+        :param date_format: The ``strftime`` format used to write the date
+                            columns of a dataframe.  Defaulted to
+                            ``'%Y-%m-%d %H:%M:%S'``
+        :return count: The number of rows written to the table
+
+        This function writes a large number of rows to a table as one
+        transaction, passing the rows to the database in batches through
+        ``executemany`` so that neither the statement nor the transaction
+        is repeated for every row.  If any row fails the entire load is
+        rolled back.  Date columns of a dataframe are written as text in
+        ``date_format``, which should match the format of the dates already
+        in the table, such as ``'%Y-%m-%d'`` for dates without a time, so
+        that the text of every row compares correctly.  Missing values are
+        written as NULL.  The journal mode and
+        synchronous pragmas are only changed for the duration of the load
+        and are restored afterwards.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > rows = [(40, '2020-08-01', 10.1, 25.75, 7230.0),
+                     (41, '2020-08-07', 9.8, 24.90, 7502.0)]
+           > columns = ['event_id', 'Date', 'Gallons', 'Cost', 'Mileage']
+           > db.insert_data('gas', rows, columns, synchronous='OFF')
+           2
+           > # Update the cost of an existing event
+           > db.insert_data('gas', [(41, '2020-08-07', 9.8, 24.95, 7502.0)],
+                            columns, upsert_keys=['event_id'])
+           1
+           > db.close_database_connection()
+        """
+        if isinstance(data, pd.DataFrame):
+            if columns is None:
+                columns = list(data.columns)
+            rows = _bindable_rows(data[columns], date_format)
+        elif columns is None:
+            sys.exit('FATAL ERROR: columns must be provided when data is '
+                     'not a dataframe')
+        else:
+            rows = iter(data)
+        names = ', '.join(_quote_identifier(column) for column in columns)
+        values = ', '.join('?' for _ in columns)
+        statement = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            _quote_identifier(table), names, values)
+        if upsert_keys:
+            updates = ', '.join('{0} = excluded.{0}'.format(
+                _quote_identifier(column)) for column in columns
+                if column not in upsert_keys)
+            keys = ', '.join(_quote_identifier(key) for key in upsert_keys)
+            action = 'DO UPDATE SET ' + updates if updates else 'DO NOTHING'
+            statement += ' ON CONFLICT ({}) {}'.format(keys, action)
+
+        previous = {}
+        if journal_mode is not None:
+            previous['journal_mode'] = self._set_pragma('journal_mode',
+                                                        journal_mode)
+        if synchronous is not None:
+            previous['synchronous'] = self._set_pragma('synchronous',
+                                                       synchronous)
+        count = 0
+        try:
+            with self.conn:
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    self.conn.executemany(statement, batch)
+                    count += len(batch)
+        finally:
+            for pragma, value in previous.items():
+                if value is not None:
+                    self._set_pragma(pragma, value)
+        return count
+# ----------------------------------------------------------------------------
+
+    def iterate_query(self, query: str, params: Union[Tuple, Dict] = None,
+                      chunk_size: int = 10000,
+                      output: str = 'dataframe') -> Iterator:
+        """
+
+        :param query: A SQLite query statement
+        :param params: The values bound to the placeholders in the query,
+                       defaulted to None
+        :param chunk_size: The maximum number of rows returned in each
+                           batch, defaulted to 10000
+        :param output: The container used for each batch.  ``'dataframe'``
+                       yields a pandas dataframe, ``'tuple'`` yields the raw
+                       list of row tuples from the cursor and ``'numpy'``
+                       yields a numpy record array with one field per column.
+                       Defaulted to ``'dataframe'``
+        :return batches: A generator that yields the query results in
+                         batches of at most ``chunk_size`` rows
+
+        This function streams the results of a query from the database
+        cursor in fixed size batches rather than loading the entire result
+        into memory at once, which allows very large tables to be processed
+        with a memory footprint bounded by ``chunk_size``.  The ``'tuple'``
+        and ``'numpy'`` outputs also avoid the overhead of constructing a
+        dataframe for each batch.
+
+        .. code-block:: python
+
+           > db = ManageSQLiteDB('../data/test/Maintenance.db')
+           > query = "SELECT Date, Cost FROM gas;"
+           > total = 0.0
+           > for batch in db.iterate_query(query, chunk_size=10, output='numpy'):
+           >     total += batch['Cost'].sum()
+           > db.close_database_connection()
+        """
+        if output not in ('dataframe', 'tuple', 'numpy'):
+            sys.exit('{}{}{}'.format('FATAL ERROR: ', output,
+                                     ' is not a valid output type'))
+        return self._iterate_query(query, params, chunk_size, output)
+# ----------------------------------------------------------------------------
+
+    def query_db(self, query: str, params: Union[Tuple, Dict] = None,
+                 parse_dates: Union[List[str], Dict[str, str]] = None,
+                 categorical: List[str] = None) -> pd.DataFrame:
+        """
+
+        :param query: A SQLite query statement
+        :param params: The values bound to the ``?`` or ``:name``
+                       placeholders in the query, passed as a tuple or
+                       dictionary respectively.  Defaulted to None for
+                       queries without placeholders
+        :param parse_dates: A list of the columns decoded as dates, or a
+                            dictionary mapping each of those columns to its
+                            ``strftime`` format.  Defaulted to None
+        :param categorical: A list of the columns decoded as pandas
+                            categoricals.  Defaulted to None
         :return df: A dataframe containing the results of the
                     SQLite query
 
@@ -1155,18 +1753,887 @@ class ManageSQLiteDB:
              - 28.30
              - 10.256
 
+        Values that change between calls should be bound as parameters.
+        The query text then stays constant, which allows SQLite to reuse
+        the prepared statement from the connection's statement cache.
+
+        .. code-block:: python
+
+           > query = "SELECT Date, Cost FROM gas WHERE Cost > ?;"
+           > df = db.query_db(query, (28.0,))
+           > df = db.query_db("SELECT Date FROM gas WHERE State = :state;",
+                              {'state': 'Utah'})
+
+        SQLite stores dates as text and has no categorical type, so columns
+        such as ``Date`` and ``State`` are returned as strings.  The
+        ``parse_dates`` and ``categorical`` arguments convert these columns
+        as part of the query, and the converted dataframe is the one stored
+        in the result cache, so repeated queries do not convert them again.
+        Parsing dates with an explicit format is considerably faster than
+        inferring it.
+
+        .. code-block:: python
+
+           > query = "SELECT Date, Cost, State FROM gas;"
+           > df = db.query_db(query, parse_dates={'Date': '%Y-%m-%d'},
+                              categorical=['State'])
+           > print(df.dtypes)
+           Date     datetime64[ns]
+           Cost            float64
+           State          category
         """
-        df = pd.read_sql_query(query, self.conn)
+        if self.advisor is not None:
+            self.advisor.record(query, params)
+        start = time.perf_counter()
+        decode = parse_dates is not None or categorical is not None
+        cache = self._result_cache
+        df = None
+        if cache is not None:
+            options = None
+            if decode:
+                dates = parse_dates.items() if isinstance(parse_dates, dict) \
+                    else parse_dates or ()
+                options = (tuple(dates), tuple(categorical or ()))
+            key = _cache_key(query, params, options)
+            state = self._data_state()
+            df = cache.get(key, state)
+        cached = df is not None
+        if cached:
+            df = df.copy()
+        else:
+            df = pd.read_sql_query(query, self.conn, params=params,
+                                   parse_dates=parse_dates)
+            for column in categorical or ():
+                df[column] = df[column].astype('category')
+            if cache is not None:
+                cache.put(key, state, df.copy())
+        if self.profiler is not None:
+            self._profile_query(query, params, df, cached,
+                                time.perf_counter() - start)
         return df
+# ----------------------------------------------------------------------------
+
+    def result_cache_info(self) -> Dict[str, int]:
+        """
+
+        :return info: A dictionary containing the number of cache
+                      ``hits``, ``misses`` and the number of ``entries``
+                      currently held in the result cache
+
+        This function reports the effectiveness of the result cache
+        enabled with ``enable_result_cache``.  All values are zero when the
+        cache is disabled.
+        """
+        cache = self._result_cache
+        if cache is None:
+            return {'hits': 0, 'misses': 0, 'entries': 0}
+        return {'hits': cache.hits, 'misses': cache.misses,
+                'entries': len(cache.entries)}
+# ----------------------------------------------------------------------------
+
+    def _data_state(self) -> Tuple[int, int, int]:
+        """
+
+        :return state: A token that changes whenever the data in the
+                       database may have changed
+        """
+        data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        mtime = 0
+        if self.mode in ('rw', 'ro'):
+            mtime = os.stat(self.database).st_mtime_ns
+        return data_version, self.conn.total_changes, mtime
+# ----------------------------------------------------------------------------
+
+    def _iterate_query(self, query: str, params: Union[Tuple, Dict],
+                       chunk_size: int, output: str) -> Iterator:
+        """
+
+        :param query: A SQLite query statement
+        :param params: The values bound to the placeholders in the query
+        :param chunk_size: The maximum number of rows returned in each batch
+        :param output: The container used for each batch
+        :return batches: A generator that yields the query results in
+                         batches of at most ``chunk_size`` rows
+
+        This function is the generator behind ``iterate_query``, which
+        checks its arguments when it is called rather than when the first
+        batch is requested.
+        """
+        cursor = self.conn.execute(query, () if params is None else params)
+        try:
+            columns = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if output == 'tuple':
+                    yield rows
+                elif output == 'numpy':
+                    yield np.rec.fromrecords(rows, names=columns)
+                else:
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+        finally:
+            cursor.close()
+# ----------------------------------------------------------------------------
+
+    def _profile_query(self, query: str, params: Union[Tuple, Dict],
+                       df: pd.DataFrame, cached: bool, seconds: float) -> None:
+        """
+
+        :param query: The SQLite query statement that was executed
+        :param params: The values bound to the placeholders in the query
+        :param df: The result of the query
+        :param cached: True if the result was served from the result cache
+        :param seconds: The wall time of the query in seconds
+
+        This function passes the measurements of a query to the profiler,
+        capturing the query plan when the query is slow.
+        """
+        plan = None
+        if seconds >= self.profiler.threshold:
+            rows = self.conn.execute('EXPLAIN QUERY PLAN ' + query,
+                                     () if params is None else params)
+            plan = [row[3] for row in rows]
+        self.profiler.record(query, params, seconds, len(df),
+                             int(df.memory_usage(deep=True).sum()),
+                             cached, plan)
+# ----------------------------------------------------------------------------
+
+    def _query_column_types(self, query: str, names: List[str],
+                            params: Union[Tuple, Dict] = None
+                            ) -> Tuple[int, List[Tuple[str, str, int, bool]]]:
+        """
+
+        :param query: A SQLite query statement
+        :param names: The names of the columns returned by the query
+        :param params: The values bound to the placeholders in the query
+        :return rows: The number of rows returned by the query
+        :return columns: A list of tuples containing the name of each
+                         column, its type, ``'int'``, ``'float'``,
+                         ``'text'`` or ``'blob'``, the maximum length of
+                         its values for text and blob columns, and whether
+                         the column contains NULL values
+
+        This function determines the type of every column returned by a
+        query with a single aggregate pass over the results.  Columns that
+        contain any text are text columns and columns that contain any
+        floating point values are float columns.
+        """
+        aggregates = ['COUNT(*)']
+        for index in range(len(names)):
+            column = 'c{}'.format(index)
+            aggregates.extend([
+                "SUM(typeof({}) = 'text')".format(column),
+                "SUM(typeof({}) = 'blob')".format(column),
+                "SUM(typeof({}) = 'real')".format(column),
+                'SUM({} IS NULL)'.format(column),
+                'MAX(LENGTH({}))'.format(column)])
+        aliases = ', '.join('c{}'.format(index) for index in range(len(names)))
+        # The closing parenthesis is placed on a new line so that a query
+        # ending in a line comment does not comment it out
+        statement = 'WITH q({}) AS ({}\n) SELECT {} FROM q'.format(
+            aliases, query.strip().rstrip(';'), ', '.join(aggregates))
+        result = self.conn.execute(statement, () if params is None else params)
+        result = result.fetchone()
+        columns = []
+        for index, name in enumerate(names):
+            text, blob, real, nulls, width = result[1 + 5 * index:6 + 5 * index]
+            if text:
+                kind = 'text'
+                width = max(width or 1, 32) if real else width or 1
+            elif blob:
+                kind = 'blob'
+                width = width or 1
+            elif real:
+                kind, width = 'float', None
+            else:
+                kind, width = 'int', None
+            columns.append((name, kind, width, bool(nulls)))
+        return result[0], columns
+# ----------------------------------------------------------------------------
+
+    def _set_pragma(self, pragma: str, value: Union[str, int]) -> Union[str, int]:
+        """
+
+        :param pragma: The name of the pragma to be set
+        :param value: The new value of the pragma
+        :return previous: The value of the pragma before it was changed, or
+                          None if the pragma does not apply to the database
+
+        This function sets a connection level pragma and returns its
+        previous value so that it can be restored later.
+        """
+        if not re.fullmatch(r'-?\w+', str(value)):
+            sys.exit('{}{}{}{}'.format('FATAL ERROR: ', value,
+                                       ' is not a valid value for ', pragma))
+        previous = self.conn.execute('PRAGMA {}'.format(pragma)).fetchone()
+        self.conn.execute('PRAGMA {} = {}'.format(pragma, value))
+        return None if previous is None else previous[0]
+# ============================================================================
+# ============================================================================
+
+
+_OPEN_CONNECTIONS = {}
+_REGISTRY_LOCK = threading.Lock()
+_CONNECTION_KEYS = counter()
+
+
+def _register_connection(db: ManageSQLiteDB) -> int:
+    """
+
+    :param db: A newly opened connection
+    :return key: The key of the connection in the registry
+    """
+    key = next(_CONNECTION_KEYS)
+    with _REGISTRY_LOCK:
+        _OPEN_CONNECTIONS[key] = (db.database, db.mode, time.time(),
+                                  threading.current_thread().name)
+    return key
+# ----------------------------------------------------------------------------
+
+
+def _release_connection(key: int, conn: sqlite3.Connection) -> None:
+    """
+
+    :param key: The key of the connection in the registry
+    :param conn: The SQLite connection to be closed
+    """
+    with _REGISTRY_LOCK:
+        _OPEN_CONNECTIONS.pop(key, None)
+    conn.close()
+# ----------------------------------------------------------------------------
+
+
+def _collect_connection(key: int, database: str,
+                        conn: sqlite3.Connection) -> None:
+    """
+
+    :param key: The key of the connection in the registry
+    :param database: The name of the database
+    :param conn: The SQLite connection to be closed
+
+    This function closes a connection whose ``ManageSQLiteDB`` was garbage
+    collected without being closed
+    """
+    warnings.warn('{}{}'.format('unclosed connection to ', database),
+                  ResourceWarning)
+    _release_connection(key, conn)
+# ----------------------------------------------------------------------------
+
+
+def _quote_identifier(name: str) -> str:
+    """
+
+    :param name: A table or column name
+    :return quoted: The name quoted for use in a SQLite statement
+    """
+    return '"{}"'.format(name.replace('"', '""'))
 # ============================================================================
 # ============================================================================
 
 
-def simple_sqlite_query(database: str, query: str) -> pd.DataFrame:
+class QueryProfiler:
+    """
+
+    :param threshold: The execution time in seconds at or above which a
+                      query is considered slow.  Defaulted to 0.1
+
+    This class collects the measurements recorded by
+    ``ManageSQLiteDB.query_db`` once profiling has been enabled with
+    ``ManageSQLiteDB.enable_profiling``.  Each query is stored in the
+    ``records`` attribute as a dictionary with the following keys.
+
+    * ``query``: The query statement
+    * ``params``: The values bound to the query
+    * ``seconds``: The wall time of the query
+    * ``rows``: The number of rows returned
+    * ``bytes``: The memory used by the resulting dataframe
+    * ``cached``: True if the result was served from the result cache
+    * ``plan``: The details of ``EXPLAIN QUERY PLAN`` for slow queries, None
+      otherwise
+    * ``full_scan``: True if the plan of a slow query scans a table or index
+      from start to finish, None for queries that are not slow
+    """
+    def __init__(self, threshold: float = 0.1):
+        self.threshold = threshold
+        self.records = []
+# ----------------------------------------------------------------------------
+
+    def clear(self) -> None:
+        """
+        This function removes all of the recorded queries
+        """
+        self.records.clear()
+# ----------------------------------------------------------------------------
+
+    def record(self, query: str, params: Union[Tuple, Dict], seconds: float,
+               rows: int, nbytes: int, cached: bool = False,
+               plan: List[str] = None) -> None:
+        """
+
+        :param query: The query statement
+        :param params: The values bound to the query
+        :param seconds: The wall time of the query
+        :param rows: The number of rows returned
+        :param nbytes: The memory used by the resulting dataframe
+        :param cached: True if the result was served from a cache
+        :param plan: The details of the query plan, defaulted to None
+        :return None:
+        """
+        full_scan = None
+        if plan is not None:
+            full_scan = any(detail.startswith('SCAN') for detail in plan)
+        self.records.append({'query': query, 'params': params,
+                             'seconds': seconds, 'rows': rows,
+                             'bytes': nbytes, 'cached': cached,
+                             'plan': plan, 'full_scan': full_scan})
+# ----------------------------------------------------------------------------
+
+    def slow_queries(self) -> List[Dict]:
+        """
+
+        :return records: The records of every query that took at least
+                         ``threshold`` seconds, slowest first
+        """
+        slow = [record for record in self.records
+                if record['seconds'] >= self.threshold]
+        return sorted(slow, key=lambda record: record['seconds'], reverse=True)
+# ----------------------------------------------------------------------------
+
+    def summary(self) -> pd.DataFrame:
+        """
+
+        :return df: A dataframe with one row per distinct query statement
+
+        This function aggregates the records by query statement, reporting
+        the number of ``calls``, the ``total_seconds``, ``mean_seconds`` and
+        ``max_seconds`` of those calls, the total ``rows`` and ``bytes``
+        returned and whether any slow call performed a ``full_scan``.  The
+        rows are sorted by ``total_seconds`` in descending order.
+
+        .. code-block:: python
+
+           > print(db.profiler.summary())
+                                            query  calls  total_seconds ...
+           0  SELECT Date, Cost FROM gas WHERE ...     12       0.004183 ...
+        """
+        columns = ['query', 'calls', 'total_seconds', 'mean_seconds',
+                   'max_seconds', 'rows', 'bytes', 'full_scan']
+        if not self.records:
+            return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(self.records)
+        df['full_scan'] = df['full_scan'].eq(True)
+        df = df.groupby('query', sort=False).agg(
+            calls=('seconds', 'size'), total_seconds=('seconds', 'sum'),
+            mean_seconds=('seconds', 'mean'), max_seconds=('seconds', 'max'),
+            rows=('rows', 'sum'), bytes=('bytes', 'sum'),
+            full_scan=('full_scan', 'any'))
+        df = df.sort_values('total_seconds', ascending=False).reset_index()
+        return df[columns]
+# ============================================================================
+# ============================================================================
+
+
+class IndexAdvisor:
+    """
+
+    :param db: The ``ManageSQLiteDB`` connection the workload is executed on
+
+    This class collects a workload of queries, usually through
+    ``ManageSQLiteDB.enable_index_advisor``, and recommends indexes for the
+    tables those queries scan in full.  Each distinct query is passed to
+    ``EXPLAIN QUERY PLAN`` to find the tables that are scanned, and the
+    columns of those tables used in ``WHERE`` and ``JOIN ... ON`` conditions
+    and in the ``ORDER BY`` clause are combined into an index, with the
+    columns compared for equality first, followed by a single range column
+    or the ordering columns.  The columns are extracted from the query
+    text with regular expressions, which handles the flat ``SELECT``
+    statements typical of ad-hoc analysis but not every SQL construct, so
+    the recommendations should be reviewed before they are created.
+
+    .. code-block:: python
+
+       > db = ManageSQLiteDB('../data/test/Maintenance.db')
+       > advisor = IndexAdvisor(db)
+       > advisor.record("SELECT Date, Cost FROM gas WHERE State = ? AND Cost > ?;",
+                        ('Utah', 25.0))
+       > print(advisor.recommend())
+         table         columns  calls                                          statement
+       0   gas  (State, Cost)      1  CREATE INDEX IF NOT EXISTS "idx_gas_State_Cost" ...
+       > advisor.create_indexes()
+    """
+    def __init__(self, db: ManageSQLiteDB):
+        self.db = db
+        self.workload = OrderedDict()
+# ----------------------------------------------------------------------------
+
+    def clear(self) -> None:
+        """
+        This function removes all of the recorded queries
+        """
+        self.workload.clear()
+# ----------------------------------------------------------------------------
+
+    def create_indexes(self, covering: bool = False) -> List[str]:
+        """
+
+        :param covering: True if the indexes should also contain the
+                         selected columns, False otherwise.  Defaulted to
+                         False
+        :return statements: The ``CREATE INDEX`` statements that were
+                            executed
+
+        This function creates every index returned by ``recommend`` and
+        refreshes the statistics used by the query planner.
+        """
+        statements = list(self.recommend(covering)['statement'])
+        for statement in statements:
+            self.db.execute(statement)
+        if statements:
+            self.db.execute('ANALYZE')
+        return statements
+# ----------------------------------------------------------------------------
+
+    def record(self, query: str, params: Union[Tuple, Dict] = None) -> None:
+        """
+
+        :param query: A SQLite query statement
+        :param params: The values bound to the placeholders in the query,
+                       defaulted to None
+        :return None:
+
+        This function adds a query to the workload.  Repeated queries
+        increase the weight given to the indexes they would use.
+        """
+        entry = self.workload.get(query)
+        if entry is None:
+            self.workload[query] = [1, params]
+        else:
+            entry[0] += 1
+            entry[1] = params
+# ----------------------------------------------------------------------------
+
+    def recommend(self, covering: bool = False) -> pd.DataFrame:
+        """
+
+        :param covering: True if the indexes should also contain the
+                         selected columns, so that the query can be answered
+                         from the index alone, False otherwise.  Defaulted
+                         to False
+        :return df: A dataframe containing the ``table``, the index
+                    ``columns``, the number of recorded ``calls`` that would
+                    use the index and the ``CREATE INDEX`` ``statement``,
+                    sorted by the number of calls
+
+        This function recommends indexes for the full table scans in the
+        recorded workload.  Indexes that already exist, including indexes
+        whose leading columns match a recommendation, are not recommended.
+        """
+        existing = {}
+        calls = OrderedDict()
+        for query, (count, params) in self.workload.items():
+            plan = self.db.conn.execute('EXPLAIN QUERY PLAN ' + query,
+                                        () if params is None else params)
+            scanned = set()
+            for row in plan:
+                match = re.match(r'(SCAN|SEARCH) (?:TABLE )?(\S+)', row[3])
+                if match is None:
+                    continue
+                if (match.group(1) == 'SCAN' and 'INDEX' not in row[3]) or \
+                        'AUTOMATIC' in row[3]:
+                    scanned.add(match.group(2))
+            if not scanned:
+                continue
+            for table, columns in _index_candidates(self.db, query, scanned,
+                                                    covering):
+                if table not in existing:
+                    existing[table] = _existing_indexes(self.db, table)
+                if any(index[:len(columns)] == columns
+                       for index in existing[table]):
+                    continue
+                key = (table, columns)
+                calls[key] = calls.get(key, 0) + count
+        rows = []
+        for (table, columns), count in calls.items():
+            name = re.sub(r'\W', '_', '_'.join(('idx', table) + columns))
+            statement = 'CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(
+                _quote_identifier(name), _quote_identifier(table),
+                ', '.join(_quote_identifier(column) for column in columns))
+            rows.append((table, columns, count, statement))
+        df = pd.DataFrame(rows, columns=['table', 'columns', 'calls',
+                                         'statement'])
+        return df.sort_values('calls', ascending=False,
+                              kind='stable').reset_index(drop=True)
+# ============================================================================
+# ============================================================================
+
+
+class _ResultCache:
+    """
+
+    :param max_entries: The maximum number of results held in the cache
+    :param ttl: The number of seconds a result remains valid, or None
+
+    A least recently used cache of query results used by
+    ``ManageSQLiteDB.query_db``.  Every entry belongs to a single database
+    state, and the cache is emptied as soon as a lookup is made with a
+    different state.
+    """
+    def __init__(self, max_entries: int, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.state = None
+        self.hits = 0
+        self.misses = 0
+# ----------------------------------------------------------------------------
+
+    def get(self, key: Hashable, state: Tuple) -> pd.DataFrame:
+        """
+
+        :param key: The key of the cached result
+        :param state: The current state of the database
+        :return df: The cached result, or None if it is not in the cache
+        """
+        if key is None:
+            return None
+        if state != self.state:
+            self.entries.clear()
+            self.state = state
+        entry = self.entries.get(key)
+        if entry is not None and self.ttl is not None and \
+                time.monotonic() - entry[0] > self.ttl:
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+# ----------------------------------------------------------------------------
+
+    def put(self, key: Hashable, state: Tuple, df: pd.DataFrame) -> None:
+        """
+
+        :param key: The key of the result
+        :param state: The state of the database the result was read from
+        :param df: The result to be cached
+        """
+        if key is None or self.max_entries < 1 or state != self.state:
+            return
+        self.entries[key] = (time.monotonic(), df)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+# ============================================================================
+# ============================================================================
+
+
+_CLAUSE_END = r'(?=\bWHERE\b|\bGROUP\s+BY\b|\bORDER\s+BY\b|\bHAVING\b|' \
+              r'\bLIMIT\b|\bUNION\b|\bWINDOW\b|\)|;|$)'
+_JOIN = r'\b(?:NATURAL\s+)?(?:(?:LEFT|RIGHT|FULL)\s+(?:OUTER\s+)?|INNER\s+|' \
+        r'CROSS\s+)?JOIN\b'
+_PREDICATE = r'((?:\w+\.)?\w+)\s*(==|=|\bIS\b|\bIN\b|<=|>=|<>|!=|<|>|' \
+             r'\bBETWEEN\b|\bLIKE\b|\bGLOB\b)'
+
+
+def _index_candidates(db: ManageSQLiteDB, query: str, scanned: set,
+                      covering: bool = False) -> List[Tuple[str, Tuple[str]]]:
+    """
+
+    :param db: The connection used to look up the table columns
+    :param query: A SQLite query statement
+    :param scanned: The names or aliases of the tables scanned by the query
+    :param covering: True if the selected columns are appended to the index
+    :return candidates: A list of tuples containing a table name and the
+                        columns of the index recommended for that table
+    """
+    text = re.sub(r"'(?:[^']|'')*'", '?', query)
+    text = re.sub(r'--[^\n]*|/\*.*?\*/', ' ', text, flags=re.S).replace('"', '')
+    flags = re.I | re.S
+
+    # Map every table and alias in the FROM clause to its table and
+    # collect the join conditions
+    aliases = {}
+    conditions = []
+    match = re.search(r'\bFROM\b(.*?)' + _CLAUSE_END, text, flags)
+    sources = re.split(r',|' + _JOIN, match.group(1), flags=re.I) \
+        if match else []
+    for source in sources:
+        parts = re.split(r'\bON\b', source, maxsplit=1, flags=re.I)
+        if len(parts) == 2:
+            conditions.append(parts[1])
+        words = [word for word in parts[0].split() if word.upper() != 'AS']
+        if words and re.fullmatch(r'\w+', words[0]):
+            aliases[words[0]] = words[0]
+            if len(words) > 1:
+                aliases[words[1]] = words[0]
+    match = re.search(r'\bWHERE\b(.*?)' + _CLAUSE_END, text, flags)
+    if match:
+        conditions.append(match.group(1))
+
+    equality, ranges = [], []
+    for condition in conditions:
+        for column, operator in re.findall(_PREDICATE, condition, flags):
+            operator = operator.upper()
+            target = equality if operator in ('=', '==', 'IS', 'IN') else ranges
+            target.append(column)
+        equality.extend(re.findall(r'(?:==|=)\s*(\w+\.\w+)', condition))
+    match = re.search(r'\bORDER\s+BY\b(.*?)(?=\bLIMIT\b|\)|;|$)', text, flags)
+    ordering = []
+    if match:
+        for item in match.group(1).split(','):
+            item = re.sub(r'\s+(ASC|DESC)\s*$', '', item.strip(), flags=re.I)
+            if re.fullmatch(r'(?:\w+\.)?\w+', item):
+                ordering.append(item)
+    selected = []
+    match = re.search(r'^\s*SELECT\s+(?:DISTINCT\s+)?(.*?)\bFROM\b', text, flags)
+    if match and covering:
+        for item in match.group(1).split(','):
+            item = re.sub(r'\s+(?:AS\s+)?\w+\s*$', '', item.strip(), flags=re.I)
+            if re.fullmatch(r'(?:\w+\.)?\w+', item):
+                selected.append(item)
+
+    candidates = []
+    for name in scanned:
+        table = aliases.get(name, name)
+        info = db.conn.execute('PRAGMA table_info({})'.format(
+            _quote_identifier(table))).fetchall()
+        known = {row[1].lower(): row[1] for row in info}
+
+        def resolve(references: List[str]) -> List[str]:
+            columns = []
+            for reference in references:
+                qualifier, _, column = reference.rpartition('.')
+                if qualifier and qualifier != name and qualifier != table:
+                    continue
+                column = known.get(column.lower())
+                if column is not None and column not in columns:
+                    columns.append(column)
+            return columns
+
+        columns = resolve(equality)
+        range_columns = [column for column in resolve(ranges)
+                         if column not in columns]
+        order_columns = resolve(ordering)
+        if range_columns:
+            columns.append(range_columns[0])
+        elif order_columns and len(order_columns) == len(ordering):
+            columns.extend(column for column in order_columns
+                           if column not in columns)
+        if not columns:
+            continue
+        if covering:
+            columns.extend(column for column in resolve(selected)
+                           if column not in columns)
+        candidates.append((table, tuple(columns)))
+    return candidates
+# ----------------------------------------------------------------------------
+
+
+def _existing_indexes(db: ManageSQLiteDB, table: str) -> List[Tuple[str]]:
+    """
+
+    :param db: The connection used to look up the indexes
+    :param table: The name of a table
+    :return indexes: The columns of every index on the table
+    """
+    indexes = []
+    names = db.conn.execute('PRAGMA index_list({})'.format(
+        _quote_identifier(table))).fetchall()
+    for row in names:
+        info = db.conn.execute('PRAGMA index_info({})'.format(
+            _quote_identifier(row[1]))).fetchall()
+        indexes.append(tuple(column[2] for column in info))
+    return indexes
+# ----------------------------------------------------------------------------
+
+
+def _bindable_rows(df: pd.DataFrame,
+                   date_format: str = '%Y-%m-%d %H:%M:%S') -> Iterator[Tuple]:
+    """
+
+    :param df: A dataframe to be written to a database
+    :param date_format: The ``strftime`` format of the date columns
+    :return rows: A generator of tuples containing the values of each row
+
+    This function converts the values of a dataframe into types that can be
+    bound to SQLite parameters.  Date columns are written as text in
+    ``date_format`` whatever their values, and missing values such as
+    ``NaN``, ``NaT`` and ``pd.NA`` are written as NULL.
+    """
+    columns = []
+    for index in range(df.shape[1]):
+        series = df.iloc[:, index]
+        missing = series.isna()
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            series = series.dt.strftime(date_format)
+        series = series.astype(object)
+        if missing.any():
+            series = series.where(~missing, None)
+        columns.append(series)
+    return zip(*columns)
+# ----------------------------------------------------------------------------
+
+
+def _cache_key(query: str, params: Union[Tuple, Dict] = None,
+               options: Tuple = None) -> Hashable:
+    """
+
+    :param query: A SQLite query statement
+    :param params: The values bound to the placeholders in the query
+    :param options: Any other options that change the result of the query
+    :return key: A hashable key for the query and its parameters, or None
+                 if the parameters cannot be hashed
+    """
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    elif params is not None:
+        params = tuple(params)
+    key = (query, params, options)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+# ============================================================================
+# ============================================================================
+
+
+class AsyncSQLiteDB:
+    """
+
+    :param database: The database name to include its path-link
+    :param max_workers: The number of threads, and therefore connections,
+                        used to execute queries.  Defaulted to 4
+    :param cached_statements: The number of prepared statements each
+                              connection keeps in its statement cache.
+                              Defaulted to 128
+    :param profile: The name of a pragma profile in ``SQLITE_PROFILES``
+                    applied to each connection.  Defaulted to None
+    :param mode: The mode used to open each connection as described in
+                 ``ManageSQLiteDB``.  Defaulted to ``'rw'``
+
+    This class is the asyncio counterpart of ``ManageSQLiteDB``.  Queries
+    are executed on a dedicated thread pool, where every thread lazily opens
+    and keeps its own ``ManageSQLiteDB`` connection, and the results are
+    returned as awaitables, so an event loop is never blocked while SQLite
+    reads the database or pandas builds the dataframe.  Up to
+    ``max_workers`` queries run concurrently.
+
+    .. code-block:: python
+
+       > async def main():
+       >     async with AsyncSQLiteDB('../data/test/Maintenance.db') as db:
+       >         query = "SELECT Date, Cost FROM gas WHERE Cost > ?;"
+       >         df = await db.query_db(query, (25.0,))
+       >     print(df)
+       > asyncio.run(main())
+    """
+    def __init__(self, database: str, max_workers: int = 4,
+                 cached_statements: int = 128, profile: str = None,
+                 mode: str = 'rw'):
+        self.database = database
+        if not os.path.isfile(self.database):
+            sys.exit('{}{}{}'.format('FATAL ERROR: ',
+                                     self.database, ' does not exist'))
+        self.cached_statements = cached_statements
+        self.profile = profile
+        self.mode = mode
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='sqlite')
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+# ----------------------------------------------------------------------------
+
+    async def __aenter__(self) -> 'AsyncSQLiteDB':
+        return self
+# ----------------------------------------------------------------------------
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close_database_connection()
+# ----------------------------------------------------------------------------
+
+    async def close_database_connection(self) -> None:
+        """
+        This function waits for all pending queries to finish, shuts down
+        the thread pool and closes the connection held by every thread
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown, True)
+        with self._lock:
+            for db in self._connections:
+                db.close_database_connection()
+            self._connections.clear()
+# ----------------------------------------------------------------------------
+
+    async def query_db(self, query: str,
+                       params: Union[Tuple, Dict] = None) -> pd.DataFrame:
+        """
+
+        :param query: A SQLite query statement
+        :param params: The values bound to the placeholders in the query,
+                       defaulted to None
+        :return df: A dataframe containing the results of the SQLite query
+
+        This function executes ``ManageSQLiteDB.query_db`` on one of the
+        worker threads and returns the result once it is available.
+
+        .. code-block:: python
+
+           > db = AsyncSQLiteDB('../data/test/Maintenance.db')
+           > query = "SELECT Date, Cost FROM gas WHERE State = ?;"
+           > utah, idaho = await asyncio.gather(db.query_db(query, ('Utah',)),
+                                                db.query_db(query, ('Idaho',)))
+           > await db.close_database_connection()
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._query,
+                                          query, params)
+# ----------------------------------------------------------------------------
+
+    def _connection(self) -> ManageSQLiteDB:
+        """
+
+        :return db: The connection owned by the calling worker thread
+        """
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = ManageSQLiteDB(self.database, self.cached_statements,
+                                self.profile, check_same_thread=False,
+                                mode=self.mode)
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+# ----------------------------------------------------------------------------
+
+    def _query(self, query: str,
+               params: Union[Tuple, Dict] = None) -> pd.DataFrame:
+        """
+
+        :param query: A SQLite query statement
+        :param params: The values bound to the placeholders in the query
+        :return df: A dataframe containing the results of the SQLite query
+        """
+        return self._connection().query_db(query, params)
+# ============================================================================
+# ============================================================================
+
+
+def simple_sqlite_query(database: str, query: str,
+                        params: Union[Tuple, Dict] = None,
+                        mode: str = 'rw') -> pd.DataFrame:
     """
 
     :param database: The SQLite database name with path-link
     :param query: The SQLite query
+    :param params: The values bound to the placeholders in the query,
+                   defaulted to None
+    :param mode: The mode used to open the database as described in
+                 ``ManageSQLiteDB``.  Defaulted to ``'rw'``
     :return df: A dataframe containing the query results
 
     This function allows a user to conduct a quick SQLite database query and
@@ -1205,10 +2672,130 @@ def simple_sqlite_query(database: str, query: str) -> pd.DataFrame:
           - 28.30
           - 10.256
     """
-    db = ManageSQLiteDB(database)
-    df = db.query_db(query)
-    db.close_database_connection()
-    return df
+    with ManageSQLiteDB(database, mode=mode) as db:
+        return db.query_db(query, params)
+# ----------------------------------------------------------------------------
+
+
+def open_sqlite_connections() -> pd.DataFrame:
+    """
+
+    :return df: A dataframe with one row for every open ``ManageSQLiteDB``
+                connection
+
+    This function reports the connections opened by ``ManageSQLiteDB``, and
+    by the functions and classes built on it, that have not been closed.
+    The dataframe contains the ``database``, the ``mode`` it was opened in,
+    the ``thread`` that opened it, the time it was ``opened`` and its
+    ``age`` in seconds, with the oldest connections first.  Long lived
+    connections that keep appearing in this report usually indicate a
+    missing call to ``close_database_connection``.
+
+    .. code-block:: python
+
+       > db = ManageSQLiteDB('../data/test/Maintenance.db')
+       > df = open_sqlite_connections()
+       > print(len(df), df['database'][0])
+       1 ../data/test/Maintenance.db
+       > print(df.groupby('database').size())
+    """
+    with _REGISTRY_LOCK:
+        records = list(_OPEN_CONNECTIONS.values())
+    now = time.time()
+    df = pd.DataFrame(records, columns=['database', 'mode', 'opened',
+                                        'thread'])
+    df['age'] = now - df['opened']
+    df['opened'] = pd.to_datetime(df['opened'], unit='s')
+    df = df[['database', 'mode', 'thread', 'opened', 'age']]
+    return df.sort_values('age', ascending=False).reset_index(drop=True)
+# ----------------------------------------------------------------------------
+
+
+async def async_sqlite_query(database: str, query: str,
+                             params: Union[Tuple, Dict] = None) -> pd.DataFrame:
+    """
+
+    :param database: The SQLite database name with path-link
+    :param query: The SQLite query
+    :param params: The values bound to the placeholders in the query,
+                   defaulted to None
+    :return df: A dataframe containing the query results
+
+    This function is the asyncio counterpart of ``simple_sqlite_query``.
+    The database is opened, queried and closed on the event loop's default
+    executor, so the event loop keeps running while the query executes.
+    Applications that issue many queries should use ``AsyncSQLiteDB``,
+    which keeps its connections open between queries.
+
+    .. code-block:: python
+
+        > file = '../data/test/Maintenance.db'
+        > query = "Select Date, Cost, Gallons FROM gas;"
+        > df = await async_sqlite_query(file, query)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, simple_sqlite_query, database,
+                                      query, params)
+# ----------------------------------------------------------------------------
+
+
+def parallel_sqlite_query(databases: Union[str, List[str]], query: str,
+                          params: Union[Tuple, Dict] = None,
+                          max_workers: int = None, processes: bool = False,
+                          shard_column: str = 'shard') -> pd.DataFrame:
+    """
+
+    :param databases: A list of SQLite database names with path-links, or a
+                      glob pattern such as ``'shards/*.db'`` that matches the
+                      databases
+    :param query: The SQLite query executed against every database
+    :param params: The values bound to the placeholders in the query,
+                   defaulted to None
+    :param max_workers: The number of databases queried at the same time.
+                        Defaulted to None, which uses the executor default
+    :param processes: True if the databases are queried in separate
+                      processes, False if they are queried in threads.
+                      Defaulted to False
+    :param shard_column: The name of the column that records the database
+                         each row was read from.  Defaulted to ``'shard'``
+    :return df: A dataframe containing the query results from every
+                database
+
+    This function executes the same query against several databases that
+    share a schema and concatenates the results.  Each database is opened
+    with a read-only connection and queried in parallel.  Threads work well
+    because SQLite releases the global interpreter lock while it reads the
+    database, while processes also parallelize the construction of the
+    dataframes for queries that return a large number of rows.  The rows of
+    each database appear together and in the order the databases are listed
+    or, for a glob pattern, in sorted order.
+
+    .. code-block:: python
+
+        > query = "SELECT Date, Cost FROM gas WHERE Cost > ?;"
+        > df = parallel_sqlite_query('../data/shards/*.db', query, (25.0,),
+                                     max_workers=8)
+        > print(df)
+    """
+    if isinstance(databases, str):
+        files = sorted(glob.glob(databases))
+        if not files:
+            sys.exit('{}{}{}'.format('FATAL ERROR: ', databases,
+                                     ' does not match any databases'))
+    else:
+        files = list(databases)
+        if not files:
+            sys.exit('FATAL ERROR: No databases were provided')
+    for file in files:
+        if not os.path.isfile(file):
+            sys.exit('{}{}{}'.format('FATAL ERROR: ', file, ' does not exist'))
+    executor_type = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_type(max_workers=max_workers) as executor:
+        frames = list(executor.map(simple_sqlite_query, files, repeat(query),
+                                   repeat(params), repeat('ro')))
+    for file, df in zip(files, frames):
+        df.insert(0, shard_column, file)
+    return pd.concat(frames, ignore_index=True)
 # ============================================================================
 # ============================================================================
 # eof
@@ -3,15 +3,23 @@ import sys
 import os
 import pytest
 import numpy as np
+import pandas as pd
 from math import isclose
 import platform
+import shutil
+import asyncio
+import sqlite3
+import gc
+import warnings
 sys.path.insert(1, os.path.abspath('core_utilities'))
 
 from core_utilities.read_files import ReadTextFileKeywords, read_csv_columns_by_headers
 from core_utilities.read_files import read_csv_columns_by_index, read_text_columns_by_headers
 from core_utilities.read_files import read_text_columns_by_index, read_excel_columns_by_headers
 from core_utilities.read_files import read_excel_columns_by_index, ManageSQLiteDB
-from core_utilities.read_files import simple_sqlite_query
+from core_utilities.read_files import simple_sqlite_query, SQLITE_PROFILES
+from core_utilities.read_files import AsyncSQLiteDB, async_sqlite_query
+from core_utilities.read_files import parallel_sqlite_query, open_sqlite_connections
 # ==============================================================================
 # ==============================================================================
 # Date:    December 11, 2020
@@ -702,6 +710,654 @@ def test_simple_sqlite_query():
     df = simple_sqlite_query(file, query)
     assert df['Date'][0] == '2020-02-04'
     assert isclose(df['Cost'][0], 27.88, rel_tol=1.0e-3)
+# ------------------------------------------------------------------------------
+
+
+def test_query_db_with_parameters():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.query_db correctly
+    binds positional and named parameters to a query
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    db = ManageSQLiteDB(file, cached_statements=16)
+    query = "SELECT Date, Cost FROM gas WHERE Date = ?;"
+    df = db.query_db(query, ('2020-02-06',))
+    assert len(df) == 1
+    assert isclose(df['Cost'][0], 23.75, rel_tol=1.0e-3)
+    query = "SELECT Date, Cost FROM gas WHERE Date = :date;"
+    df = db.query_db(query, {'date': '2020-02-13'})
+    db.close_database_connection()
+    assert len(df) == 1
+    assert isclose(df['Cost'][0], 28.30, rel_tol=1.0e-3)
+# ------------------------------------------------------------------------------
+
+
+def test_simple_sqlite_query_with_parameters():
+    """
+
+    This function tests to ensure that simple_sqlite_query passes its
+    parameters through to the query
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    query = "SELECT Date, Cost FROM gas WHERE Date = ?;"
+    df = simple_sqlite_query(file, query, ('2020-02-04',))
+    assert len(df) == 1
+    assert isclose(df['Cost'][0], 27.88, rel_tol=1.0e-3)
+# ------------------------------------------------------------------------------
+
+
+def test_iterate_query():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.iterate_query streams
+    the complete result of a query in batches for every output type
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    db = ManageSQLiteDB(file)
+    query = "SELECT Date, Cost FROM gas;"
+    batches = list(db.iterate_query(query, chunk_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 10, 9]
+    assert batches[0]['Date'][0] == '2020-02-04'
+    rows = list(db.iterate_query(query, chunk_size=10, output='tuple'))
+    assert rows[0][0] == ('2020-02-04', 27.88)
+    arrays = list(db.iterate_query(query, chunk_size=50, output='numpy'))
+    # An invalid output fails when iterate_query is called, not when it is
+    # first iterated
+    with pytest.raises(SystemExit):
+        db.iterate_query(query, output='list')
+    db.close_database_connection()
+    assert len(arrays) == 1
+    assert arrays[0]['Date'][1] == '2020-02-06'
+    assert isclose(arrays[0]['Cost'][0], 27.88, rel_tol=1.0e-3)
+# ------------------------------------------------------------------------------
+
+
+def test_insert_data():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.insert_data correctly
+    inserts and upserts rows from tuples and dataframes
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        copy = '../data/test/insert_test.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        copy = r'..\data\test\insert_test.db'
+    shutil.copy(file, copy)
+    db = ManageSQLiteDB(copy)
+    columns = ['event_id', 'Date', 'Gallons', 'Cost', 'Mileage']
+    rows = [(40, '2020-08-01', 10.1, 25.75, 7230.0),
+            (41, '2020-08-07', 9.8, 24.90, 7502.0)]
+    count = db.insert_data('gas', rows, columns, batch_size=1,
+                           journal_mode='MEMORY', synchronous='OFF')
+    assert count == 2
+    df = pd.DataFrame({'event_id': [41, 42], 'Date': ['2020-08-07', '2020-08-12'],
+                       'Gallons': [9.8, 10.4], 'Cost': [24.95, 26.10],
+                       'Mileage': [7502.0, 7790.0]})
+    count = db.insert_data('gas', df, upsert_keys=['event_id'])
+    assert count == 2
+    result = db.query_db("SELECT event_id, Cost FROM gas WHERE event_id > 39;")
+    synchronous = db.conn.execute('PRAGMA synchronous').fetchone()[0]
+    db.close_database_connection()
+    os.remove(copy)
+    assert list(result['event_id']) == [40, 41, 42]
+    assert isclose(result['Cost'][1], 24.95, rel_tol=1.0e-3)
+    assert synchronous == 2
+# ------------------------------------------------------------------------------
+
+
+def test_insert_data_dates_and_nulls():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.insert_data writes
+    datetime columns and nullable columns from a dataframe, including a
+    dataframe read with parse_dates
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        copy = '../data/test/insert_dates_test.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        copy = r'..\data\test\insert_dates_test.db'
+    shutil.copy(file, copy)
+    db = ManageSQLiteDB(copy)
+    df = pd.DataFrame({'event_id': [40, 41],
+                       'Date': [pd.Timestamp('2020-08-01'),
+                                pd.Timestamp('2020-08-07 10:30')],
+                       'Gallons': [10.1, 9.8], 'Cost': [25.75, 24.90],
+                       'Mileage': [7230.0, 7502.0],
+                       'Octane': pd.array([89, None], dtype='Int64'),
+                       'Town': [np.nan, 'Denver']})
+    assert db.insert_data('gas', df) == 2
+    result = db.conn.execute('SELECT Date, Octane, Town FROM gas WHERE '
+                             'event_id > 39 ORDER BY event_id;').fetchall()
+    assert result == [('2020-08-01 00:00:00', 89, None),
+                      ('2020-08-07 10:30:00', None, 'Denver')]
+
+    # Dates that are all at midnight are written in the same format
+    midnight = df.iloc[:1].copy()
+    midnight['event_id'] = 42
+    assert db.insert_data('gas', midnight) == 1
+    result = db.conn.execute('SELECT Date FROM gas WHERE event_id = 42;')
+    assert result.fetchone() == ('2020-08-01 00:00:00',)
+
+    # Rows read with parse_dates can be written back unchanged
+    query = ("SELECT event_id, Date, Gallons, Cost, Mileage FROM gas "
+             "WHERE event_id < 5;")
+    before = db.conn.execute(query).fetchall()
+    frame = db.query_db(query, parse_dates=['Date'])
+    assert db.insert_data('gas', frame, upsert_keys=['event_id'],
+                          date_format='%Y-%m-%d') == 4
+    assert db.conn.execute(query).fetchall() == before
+    db.close_database_connection()
+    os.remove(copy)
+# ------------------------------------------------------------------------------
+
+
+def test_apply_profile():
+    """
+
+    This function tests to ensure that ManageSQLiteDB applies the pragmas
+    of a named connection profile
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        copy = '../data/test/profile_test.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        copy = r'..\data\test\profile_test.db'
+    shutil.copy(file, copy)
+    db = ManageSQLiteDB(copy, profile='read_heavy')
+    journal = db.conn.execute('PRAGMA journal_mode').fetchone()[0]
+    cache = db.conn.execute('PRAGMA cache_size').fetchone()[0]
+    temp_store = db.conn.execute('PRAGMA temp_store').fetchone()[0]
+    db.apply_profile('safe')
+    safe_journal = db.conn.execute('PRAGMA journal_mode').fetchone()[0]
+    synchronous = db.conn.execute('PRAGMA synchronous').fetchone()[0]
+    with pytest.raises(SystemExit):
+        db.apply_profile('not_a_profile')
+    db.close_database_connection()
+    os.remove(copy)
+    assert journal == 'wal'
+    assert cache == SQLITE_PROFILES['read_heavy']['cache_size']
+    assert temp_store == 2
+    assert safe_journal == 'delete'
+    assert synchronous == 2
+# ------------------------------------------------------------------------------
+
+
+def test_result_cache():
+    """
+
+    This function tests to ensure that the ManageSQLiteDB result cache
+    serves repeated queries and is invalidated when the data changes
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        copy = '../data/test/cache_test.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        copy = r'..\data\test\cache_test.db'
+    shutil.copy(file, copy)
+    db = ManageSQLiteDB(copy)
+    db.enable_result_cache(max_entries=1)
+    query = "SELECT COUNT(*) AS num FROM gas WHERE Cost > ?;"
+    first = db.query_db(query, (20.0,))
+    first['num'] = 0
+    second = db.query_db(query, (20.0,))
+    assert db.result_cache_info() == {'hits': 1, 'misses': 1, 'entries': 1}
+    assert second['num'][0] == 29
+    db.query_db(query, (25.0,))
+    db.query_db(query, (20.0,))
+    assert db.result_cache_info() == {'hits': 1, 'misses': 3, 'entries': 1}
+
+    writer = ManageSQLiteDB(copy)
+    writer.insert_data('gas', [(40, '2020-08-01', 10.1, 25.75, 7230.0)],
+                       ['event_id', 'Date', 'Gallons', 'Cost', 'Mileage'])
+    writer.close_database_connection()
+    third = db.query_db(query, (20.0,))
+    db.disable_result_cache()
+    db.close_database_connection()
+    os.remove(copy)
+    assert third['num'][0] == 30
+# ------------------------------------------------------------------------------
+
+
+def test_async_query_db():
+    """
+
+    This function tests to ensure that AsyncSQLiteDB runs concurrent queries
+    and returns their results
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+
+    async def run_queries():
+        async with AsyncSQLiteDB(file, max_workers=2) as db:
+            query = "SELECT Date, Cost FROM gas WHERE Date = ?;"
+            return await asyncio.gather(db.query_db(query, ('2020-02-04',)),
+                                        db.query_db(query, ('2020-02-06',)),
+                                        db.query_db(query, ('2020-02-13',)))
+
+    first, second, third = asyncio.run(run_queries())
+    assert isclose(first['Cost'][0], 27.88, rel_tol=1.0e-3)
+    assert isclose(second['Cost'][0], 23.75, rel_tol=1.0e-3)
+    assert isclose(third['Cost'][0], 28.30, rel_tol=1.0e-3)
+# ------------------------------------------------------------------------------
+
+
+def test_async_sqlite_query():
+    """
+
+    This function tests to ensure that async_sqlite_query returns the
+    results of a query
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    query = "Select Date, Cost, Gallons FROM gas;"
+    df = asyncio.run(async_sqlite_query(file, query))
+    assert df['Date'][0] == '2020-02-04'
+    assert isclose(df['Cost'][0], 27.88, rel_tol=1.0e-3)
+# ------------------------------------------------------------------------------
+
+
+def test_parallel_sqlite_query():
+    """
+
+    This function tests to ensure that parallel_sqlite_query combines the
+    results of a query across several databases with a shard column
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        shard1 = '../data/test/shard_test1.db'
+        shard2 = '../data/test/shard_test2.db'
+        pattern = '../data/test/shard_test*.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        shard1 = r'..\data\test\shard_test1.db'
+        shard2 = r'..\data\test\shard_test2.db'
+        pattern = r'..\data\test\shard_test*.db'
+    shutil.copy(file, shard1)
+    shutil.copy(file, shard2)
+    query = "SELECT Date, Cost FROM gas WHERE Date = ?;"
+    df = parallel_sqlite_query([shard2, shard1], query, ('2020-02-04',))
+    assert list(df['shard']) == [shard2, shard1]
+    assert isclose(df['Cost'][1], 27.88, rel_tol=1.0e-3)
+    df = parallel_sqlite_query(pattern, query, ('2020-02-06',),
+                               processes=True, shard_column='source')
+    os.remove(shard1)
+    os.remove(shard2)
+    assert list(df['source']) == [shard1, shard2]
+    assert list(df['Date']) == ['2020-02-06', '2020-02-06']
+    with pytest.raises(SystemExit):
+        parallel_sqlite_query([], query, ('2020-02-06',))
+# ------------------------------------------------------------------------------
+
+
+def test_query_profiler():
+    """
+
+    This function tests to ensure that the ManageSQLiteDB profiler records
+    queries and captures the plan of slow queries
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    db = ManageSQLiteDB(file)
+    profiler = db.enable_profiling(threshold=0.0)
+    db.query_db("SELECT Date, Cost FROM gas WHERE Cost > ?;", (25.0,))
+    db.query_db("SELECT Date, Cost FROM gas WHERE Cost > ?;", (28.0,))
+    db.query_db("SELECT Date FROM gas WHERE event_id = ?;", (2,))
+    db.close_database_connection()
+    assert len(profiler.records) == 3
+    assert profiler.records[0]['rows'] == 21
+    assert profiler.records[0]['bytes'] > 0
+    assert profiler.records[0]['full_scan']
+    assert not profiler.records[2]['full_scan']
+    assert len(profiler.slow_queries()) == 3
+    summary = profiler.summary()
+    assert len(summary) == 2
+    calls = dict(zip(summary['query'], summary['calls']))
+    assert calls["SELECT Date, Cost FROM gas WHERE Cost > ?;"] == 2
+    profiler.threshold = 100.0
+    assert profiler.slow_queries() == []
+# ------------------------------------------------------------------------------
+
+
+def test_index_advisor():
+    """
+
+    This function tests to ensure that the IndexAdvisor recommends and
+    creates indexes for queries that scan a table
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        copy = '../data/test/advisor_test.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        copy = r'..\data\test\advisor_test.db'
+    shutil.copy(file, copy)
+    db = ManageSQLiteDB(copy)
+    advisor = db.enable_index_advisor()
+    query = "SELECT Date, Cost FROM gas WHERE State = ? AND Cost > ? ORDER BY Date;"
+    db.query_db(query, ('Utah', 25.0))
+    db.query_db(query, ('Utah', 20.0))
+    db.query_db("SELECT g.Date FROM gas AS g WHERE g.Town = 'Midvale' ORDER BY g.Date;")
+    db.query_db("SELECT Date FROM gas WHERE event_id = ?;", (3,))
+    df = advisor.recommend()
+    assert list(df['columns']) == [('State', 'Cost'), ('Town', 'Date')]
+    assert list(df['calls']) == [2, 1]
+    covering = advisor.recommend(covering=True)
+    assert covering['columns'][0] == ('State', 'Cost', 'Date')
+    statements = advisor.create_indexes()
+    remaining = advisor.recommend()
+    plan = db.conn.execute('EXPLAIN QUERY PLAN ' + query, ('Utah', 25.0)).fetchall()
+    db.close_database_connection()
+    os.remove(copy)
+    assert len(statements) == 2
+    assert len(remaining) == 0
+    assert plan[0][3].startswith('SEARCH')
+# ------------------------------------------------------------------------------
+
+
+def test_export_query_csv():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.export_query writes the
+    results of a query to a csv file
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        out_file = '../data/test/export_test.csv'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        out_file = r'..\data\test\export_test.csv'
+    db = ManageSQLiteDB(file)
+    query = "SELECT Date, Cost, Block FROM gas WHERE Cost > ?;"
+    count = db.export_query(query, out_file, 'csv', (28.0,), chunk_size=4)
+    db.close_database_connection()
+    df = pd.read_csv(out_file)
+    os.remove(out_file)
+    assert count == 11
+    assert len(df) == 11
+    assert list(df.columns) == ['Date', 'Cost', 'Block']
+    assert df['Date'][0] == '2020-02-13'
+    assert isclose(df['Cost'][0], 28.30, rel_tol=1.0e-3)
+# ------------------------------------------------------------------------------
+
+
+def test_export_query_npy():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.export_query writes the
+    results of a query to a numpy structured array file
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        out_file = '../data/test/export_test.npy'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        out_file = r'..\data\test\export_test.npy'
+    db = ManageSQLiteDB(file)
+    query = "SELECT event_id, Date, Cost, Block FROM gas;"
+    count = db.export_query(query, out_file, 'npy', chunk_size=10)
+    db.close_database_connection()
+    data = np.load(out_file)
+    os.remove(out_file)
+    assert count == 39
+    assert data.shape == (39,)
+    assert data['event_id'][38] == 39
+    assert data['Date'][0] == '2020-02-04'
+    assert isclose(data['Cost'][0], 27.88, rel_tol=1.0e-3)
+    assert data['Block'][0] == 'Start'
+    assert data['Block'][1] == ''
+# ------------------------------------------------------------------------------
+
+
+def test_export_query_parquet():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.export_query writes the
+    results of a query to a parquet file
+    """
+    pytest.importorskip('pyarrow')
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        out_file = '../data/test/export_test.parquet'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        out_file = r'..\data\test\export_test.parquet'
+    db = ManageSQLiteDB(file)
+    query = "SELECT event_id, Date, Cost, Block FROM gas;"
+    count = db.export_query(query, out_file, chunk_size=10)
+    db.close_database_connection()
+    df = pd.read_parquet(out_file)
+    os.remove(out_file)
+    assert count == 39
+    assert len(df) == 39
+    assert df['Date'][0] == '2020-02-04'
+    assert isclose(df['Cost'][0], 27.88, rel_tol=1.0e-3)
+    assert df['Block'][0] == 'Start'
+# ------------------------------------------------------------------------------
+
+
+def test_export_query_mixed_text():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.export_query writes a
+    column that mixes text and numbers in the same way to parquet and npy
+    files, and accepts a query that ends in a comment
+    """
+    pytest.importorskip('pyarrow')
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        out_file = '../data/test/export_mixed.parquet'
+        npy_file = '../data/test/export_mixed.npy'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        out_file = r'..\data\test\export_mixed.parquet'
+        npy_file = r'..\data\test\export_mixed.npy'
+    db = ManageSQLiteDB(file)
+    query = ("SELECT event_id, CASE WHEN Cost > 25 THEN 'high' ELSE Octane "
+             "END AS level FROM gas ORDER BY event_id -- mixed types")
+    assert db.export_query(query, out_file) == 39
+    assert db.export_query(query, npy_file, 'npy') == 39
+    expected = db.query_db(query)['level'].astype(str).tolist()
+    db.close_database_connection()
+    df = pd.read_parquet(out_file)
+    data = np.load(npy_file)
+    os.remove(out_file)
+    os.remove(npy_file)
+    assert df['level'].tolist() == expected
+    assert data['level'].tolist() == expected
+    assert 'high' in expected and len(set(expected)) > 1
+# ------------------------------------------------------------------------------
+
+
+def test_export_query_nulls_and_names():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.export_query keeps
+    integer columns with NULL values as integers in parquet files, runs the
+    query only once besides the aggregate pass, and rejects repeated column
+    names
+    """
+    pytest.importorskip('pyarrow')
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+        out_file = '../data/test/export_nulls.parquet'
+        npy_file = '../data/test/export_nulls.npy'
+    else:
+        file = r'..\data\test\Maintenance.db'
+        out_file = r'..\data\test\export_nulls.parquet'
+        npy_file = r'..\data\test\export_nulls.npy'
+    db = ManageSQLiteDB(file)
+    query = ("SELECT event_id, CASE WHEN Cost > 25 THEN Octane END AS octane "
+             "FROM gas ORDER BY event_id")
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    assert db.export_query(query, out_file) == 39
+    db.conn.set_trace_callback(None)
+    assert db.export_query(query, npy_file, 'npy') == 39
+    expected = db.query_db(query)['octane']
+    with pytest.raises(SystemExit):
+        db.export_query("SELECT Date, Date FROM gas", npy_file, 'npy')
+    with pytest.raises(SystemExit):
+        db.export_query("SELECT Cost AS a, Block AS a FROM gas", out_file)
+    db.close_database_connection()
+    pq = pytest.importorskip('pyarrow.parquet')
+    schema = pq.read_schema(out_file)
+    df = pd.read_parquet(out_file)
+    data = np.load(npy_file)
+    os.remove(out_file)
+    os.remove(npy_file)
+    assert [statement.startswith(query) for statement in statements] == \
+        [False, True, False, False]
+    assert str(schema.field('octane').type) == 'int64'
+    assert df['octane'].dropna().tolist() == expected.dropna().tolist()
+    assert df['octane'].isna().tolist() == expected.isna().tolist()
+    assert data['octane'].dtype == np.float64
+    assert np.isnan(data['octane']).tolist() == expected.isna().tolist()
+# ------------------------------------------------------------------------------
+
+
+def test_read_only_modes():
+    """
+
+    This function tests to ensure that ManageSQLiteDB reads databases opened
+    in the read-only, immutable and in-memory modes and rejects writes to
+    the file
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    query = "SELECT Date, Cost FROM gas;"
+    update = "UPDATE gas SET Cost = 0.0;"
+    for mode in ['ro', 'immutable']:
+        db = ManageSQLiteDB(file, mode=mode, profile='read_heavy')
+        df = db.query_db(query)
+        assert df['Date'][0] == '2020-02-04'
+        with pytest.raises(sqlite3.OperationalError):
+            db.execute(update)
+        db.close_database_connection()
+
+    db = ManageSQLiteDB(file, mode='memory')
+    assert db.execute(update) == 39
+    df = db.query_db(query)
+    db.close_database_connection()
+    assert df['Cost'][0] == 0.0
+    df = simple_sqlite_query(file, query, mode='ro')
+    assert isclose(df['Cost'][0], 27.88, rel_tol=1.0e-3)
+    with pytest.raises(SystemExit):
+        ManageSQLiteDB(file, mode='write')
+# ------------------------------------------------------------------------------
+
+
+def test_connection_lifecycle():
+    """
+
+    This function tests to ensure that ManageSQLiteDB connections are
+    registered while open and released by the context manager, by an
+    explicit close, by garbage collection and by simple_sqlite_query when
+    its query fails
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    before = len(open_sqlite_connections())
+    with ManageSQLiteDB(file, mode='ro') as db:
+        df = open_sqlite_connections()
+        assert len(df) == before + 1
+        assert file in list(df['database'])
+        assert list(df.columns) == ['database', 'mode', 'thread', 'opened', 'age']
+    assert len(open_sqlite_connections()) == before
+    with pytest.raises(sqlite3.ProgrammingError):
+        db.query_db("SELECT Date FROM gas;")
+    db.close_database_connection()
+
+    db = ManageSQLiteDB(file)
+    assert len(open_sqlite_connections()) == before + 1
+    with pytest.warns(ResourceWarning):
+        del db
+        gc.collect()
+    assert len(open_sqlite_connections()) == before
+
+    # A failed query closes the connection opened by simple_sqlite_query
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        with pytest.raises(Exception):
+            simple_sqlite_query(file, "SELECT Missing FROM gas;")
+        gc.collect()
+    assert not [warning for warning in caught
+                if issubclass(warning.category, ResourceWarning)]
+    assert len(open_sqlite_connections()) == before
+# ------------------------------------------------------------------------------
+
+
+def test_query_db_decode_columns():
+    """
+
+    This function tests to ensure that ManageSQLiteDB.query_db decodes date
+    and categorical columns while it builds the dataframe
+    """
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/Maintenance.db'
+    else:
+        file = r'..\data\test\Maintenance.db'
+    db = ManageSQLiteDB(file)
+    db.enable_result_cache()
+    query = "SELECT Date, Cost, State FROM gas;"
+    df = db.query_db(query, parse_dates={'Date': '%Y-%m-%d'},
+                     categorical=['State'])
+    plain = db.query_db(query)
+    dates = db.query_db(query, parse_dates=['Date'])
+    db.close_database_connection()
+    assert pd.api.types.is_datetime64_any_dtype(df['Date'])
+    assert df['Date'][0] == pd.Timestamp(2020, 2, 4)
+    assert isinstance(df['State'].dtype, pd.CategoricalDtype)
+    assert df['State'][0] == 'Utah'
+    assert isclose(df['Cost'][0], 27.88, rel_tol=1.0e-3)
+    assert plain['Date'][0] == '2020-02-04'
+    assert pd.api.types.is_datetime64_any_dtype(dates['Date'])
+    assert not isinstance(dates['State'].dtype, pd.CategoricalDtype)
 # ==============================================================================
 # ==============================================================================
 # eof
@@ -6,7 +6,7 @@ import shutil
 from math import isclose
 sys.path.insert(1, os.path.abspath('core_utilities'))
 
-from core_utilities.operating_system import OSUtilities
+from core_utilities.operating_system import OSUtilities, FileIndex
 # ==============================================================================
 # ==============================================================================
 # Date:    December 11, 2020
@@ -100,6 +100,27 @@ def test_count_word_occurrence():
 # ------------------------------------------------------------------------------
 
 
+def test_count_words_occurrence():
+    """
+
+    This function tests the OSUtilities.count_occurrence_of_words_in_file
+    function to ensure it counts several words in one pass, including words
+    that are split between the blocks read from the file
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        file = '../data/test/text_file.txt'
+    else:
+        file = r'..\data\test\text_file.txt'
+    expected = {'file': 4, 'this': 1, 'the': 2, 'missing': 0}
+    for chunk_size in (1, 3, 7, 1 << 20):
+        counts = util.count_occurrence_of_words_in_file(file, list(expected),
+                                                        chunk_size=chunk_size)
+        assert counts == expected
+# ------------------------------------------------------------------------------
+
+
 def test_create_directory():
     """
 
@@ -559,6 +580,551 @@ def test_move_directory():
     assert os.path.isfile(file3)
     if os.path.isdir(file2):
         util.move_directory(file2, file1)
+# ------------------------------------------------------------------------------
+
+
+def test_walk_directory():
+    """
+
+    This function tests the OSUtilities.walk_directory function to ensure it
+    recursively returns the files and directories that pass its filters
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        directory = '../data/test/move_directory3'
+    else:
+        directory = r'..\data\test\move_directory3'
+    entries = list(util.walk_directory(directory, extension='.txt'))
+    names = sorted(entry.name for entry in entries)
+    assert names == ['test.txt', 'test1.txt', 'test2.txt']
+    assert all(entry.is_file() for entry in entries)
+
+    entries = list(util.walk_directory(directory, files=False, dirs=True))
+    assert [entry.name for entry in entries] == ['test']
+
+    entries = list(util.walk_directory(directory, pattern='test?.txt'))
+    assert sorted(entry.name for entry in entries) == ['test1.txt', 'test2.txt']
+
+    entries = list(util.walk_directory(directory, min_size=1))
+    assert [entry.name for entry in entries] == ['.DS_Store']
+    entries = list(util.walk_directory(directory, max_size=0, dirs=True))
+    paths = [entry.path for entry in entries]
+    assert paths.index(os.path.join(directory, 'test')) < \
+        paths.index(os.path.join(directory, 'test', 'test.txt'))
+# ------------------------------------------------------------------------------
+
+
+def test_walk_directory_symlinks():
+    """
+
+    This function tests the OSUtilities.walk_directory function to ensure
+    that symbolic links are only returned when they are followed and that
+    dangling links are never returned
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        directory = '../data/test/walk_links'
+    else:
+        directory = r'..\data\test\walk_links'
+    os.makedirs(os.path.join(directory, 'sub'))
+    util.create_file(os.path.join(directory, 'sub', 'file.txt'))
+    os.symlink(os.path.abspath(os.path.join(directory, 'sub')),
+               os.path.join(directory, 'dir_link'))
+    os.symlink(os.path.abspath(os.path.join(directory, 'missing.txt')),
+               os.path.join(directory, 'dangling'))
+    entries = list(util.walk_directory(directory))
+    assert [entry.name for entry in entries] == ['file.txt']
+    assert all(entry.is_file() for entry in entries)
+    entries = list(util.walk_directory(directory, follow_symlinks=True))
+    assert sorted(entry.name for entry in entries) == ['file.txt', 'file.txt']
+    entries = list(util.walk_directory(directory, dirs=True,
+                                       follow_symlinks=True))
+    assert 'dangling' not in [entry.name for entry in entries]
+
+    # A second path to a directory is searched, a link to an ancestor is not
+    os.symlink(os.path.abspath(directory),
+               os.path.join(directory, 'sub', 'loop'))
+    entries = list(util.walk_directory(directory, follow_symlinks=True))
+    assert sorted(os.path.relpath(entry.path, directory)
+                  for entry in entries) == \
+        [os.path.join('dir_link', 'file.txt'), os.path.join('sub', 'file.txt')]
+    assert list(util.walk_directory(os.path.join(directory, 'missing'))) == []
+    assert list(util.walk_directory(os.path.join(directory, 'missing'),
+                                    follow_symlinks=True)) == []
+    shutil.rmtree(directory)
+# ------------------------------------------------------------------------------
+
+
+def test_copy_and_move_files_classification():
+    """
+
+    This function tests the OSUtilities.copy_files and OSUtilities.move_files
+    functions to ensure that extensionless files are treated as files and
+    directories with a period in their name are treated as directories
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        source = '../data/test/classify_source'
+        destination = '../data/test/classify_destination'
+    else:
+        source = r'..\data\test\classify_source'
+        destination = r'..\data\test\classify_destination'
+    os.mkdir(source)
+    os.mkdir(destination)
+    os.mkdir(os.path.join(source, 'data.v1'))
+    util.create_file(os.path.join(source, 'data.v1', 'test.txt'))
+    util.create_file(os.path.join(source, 'README'))
+
+    util.copy_files(destination, source)
+    assert os.path.isfile(os.path.join(destination, 'README'))
+    assert os.path.isfile(os.path.join(destination, 'data.v1', 'test.txt'))
+    shutil.rmtree(destination)
+    os.mkdir(destination)
+
+    util.copy_files(destination, source, dirs=True)
+    assert os.path.isdir(os.path.join(destination, 'data.v1'))
+    assert not os.path.exists(os.path.join(destination, 'README'))
+    shutil.rmtree(destination)
+    os.mkdir(destination)
+
+    util.move_files(destination, source)
+    assert os.path.isfile(os.path.join(destination, 'README'))
+    assert os.path.isfile(os.path.join(destination, 'data.v1', 'test.txt'))
+    assert os.listdir(source) == []
+    shutil.rmtree(source)
+    shutil.rmtree(destination)
+# ------------------------------------------------------------------------------
+
+
+def test_parallel_copy():
+    """
+
+    This function tests the OSUtilities.copy_directory and
+    OSUtilities.copy_files functions to ensure that the parallel copy engine
+    copies every file and reports its progress
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        source = '../data/test/parallel_source'
+        destination = '../data/test/parallel_destination'
+    else:
+        source = r'..\data\test\parallel_source'
+        destination = r'..\data\test\parallel_destination'
+    os.mkdir(source)
+    for i in range(3):
+        directory = os.path.join(source, 'dir{}'.format(i), 'sub')
+        os.makedirs(directory)
+        for j in range(5):
+            with open(os.path.join(directory, 'file{}.txt'.format(j)), 'w') as file:
+                file.write('data {} {}'.format(i, j))
+    util.create_file(os.path.join(source, 'top.txt'))
+    reports = []
+    util.copy_directory(source, destination, workers=4,
+                        progress=lambda copied, total: reports.append((copied, total)))
+    assert len(reports) == 16
+    assert reports[-1] == (16, 16)
+    with open(os.path.join(destination, 'dir2', 'sub', 'file4.txt')) as file:
+        assert file.read() == 'data 2 4'
+    assert os.path.isfile(os.path.join(destination, 'top.txt'))
+    shutil.rmtree(destination)
+
+    os.mkdir(destination)
+    util.copy_files(destination, source, workers=4)
+    assert os.path.isfile(os.path.join(destination, 'top.txt'))
+    assert os.path.isfile(os.path.join(destination, 'dir0', 'sub', 'file0.txt'))
+    shutil.rmtree(destination)
+
+    # A trailing separator on the source must not change where files land
+    util.copy_directory(os.path.join(source, ''), destination, workers=4)
+    assert os.path.isfile(os.path.join(destination, 'top.txt'))
+    assert os.path.isfile(os.path.join(destination, 'dir1', 'sub', 'file3.txt'))
+    assert not os.path.exists(destination + 'top.txt')
+    shutil.rmtree(destination)
+    shutil.rmtree(source)
+# ------------------------------------------------------------------------------
+
+
+def test_kernel_copy():
+    """
+
+    This function tests the OSUtilities.copy_file function with the
+    kernel_copy option to ensure that the file data is copied exactly
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        source = '../data/test/kernel_source.bin'
+        destination = '../data/test/kernel_destination.bin'
+        empty = '../data/test/kernel_empty.bin'
+        empty_copy = '../data/test/kernel_empty_copy.bin'
+    else:
+        source = r'..\data\test\kernel_source.bin'
+        destination = r'..\data\test\kernel_destination.bin'
+        empty = r'..\data\test\kernel_empty.bin'
+        empty_copy = r'..\data\test\kernel_empty_copy.bin'
+    data = bytes(range(256)) * 12000
+    with open(source, 'wb') as file:
+        file.write(data)
+    util.copy_file(source, destination, kernel_copy=True)
+    with open(destination, 'rb') as file:
+        assert file.read() == data
+    util.create_file(empty)
+    assert util._kernel_copy(empty, empty_copy) in \
+        ('reflink', 'copy_file_range', 'sendfile', 'userspace')
+    assert os.path.getsize(empty_copy) == 0
+    for file_name in (source, destination, empty, empty_copy):
+        os.remove(file_name)
+# ------------------------------------------------------------------------------
+
+
+def test_sync_directory():
+    """
+
+    This function tests the OSUtilities.sync_directory function to ensure
+    that only new or changed files are copied and extraneous files are
+    deleted
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        source = '../data/test/sync_source'
+        destination = '../data/test/sync_destination'
+    else:
+        source = r'..\data\test\sync_source'
+        destination = r'..\data\test\sync_destination'
+    os.makedirs(os.path.join(source, 'sub'))
+    for name in ('one.txt', 'two.txt', os.path.join('sub', 'three.txt')):
+        with open(os.path.join(source, name), 'w') as file:
+            file.write('contents of ' + name)
+    counts = util.sync_directory(source, destination, workers=2)
+    assert counts == {'copied': 3, 'skipped': 0, 'deleted': 0}
+    assert util.sync_directory(source, destination) == \
+        {'copied': 0, 'skipped': 3, 'deleted': 0}
+
+    # Change the size of one file and the contents of another without
+    # changing its size or modification time
+    with open(os.path.join(source, 'one.txt'), 'a') as file:
+        file.write(' and more')
+    status = os.stat(os.path.join(source, 'two.txt'))
+    with open(os.path.join(source, 'two.txt'), 'w') as file:
+        file.write('CONTENTS OF two.txt')
+    os.utime(os.path.join(source, 'two.txt'),
+             ns=(status.st_atime_ns, status.st_mtime_ns))
+    assert util.sync_directory(source, destination)['copied'] == 1
+    assert util.sync_directory(source, destination, checksum=True)['copied'] == 1
+    with open(os.path.join(destination, 'two.txt')) as file:
+        assert file.read() == 'CONTENTS OF two.txt'
+
+    util.create_file(os.path.join(destination, 'extra.txt'))
+    os.makedirs(os.path.join(destination, 'old', 'deeper'))
+    util.create_file(os.path.join(destination, 'old', 'deeper', 'stale.txt'))
+    counts = util.sync_directory(source, destination, delete=True)
+    assert counts == {'copied': 0, 'skipped': 3, 'deleted': 2}
+    assert sorted(os.listdir(destination)) == ['one.txt', 'sub', 'two.txt']
+
+    # A dangling link in the source is skipped rather than failing the sync
+    os.symlink(os.path.abspath(os.path.join(source, 'missing.txt')),
+               os.path.join(source, 'dangling'))
+    counts = util.sync_directory(source, destination, delete=True)
+    assert counts == {'copied': 0, 'skipped': 3, 'deleted': 0}
+    assert not os.path.lexists(os.path.join(destination, 'dangling'))
+    shutil.rmtree(destination)
+
+    # A trailing separator on the source must not change where files land
+    counts = util.sync_directory(os.path.join(source, ''), destination,
+                                 delete=True)
+    assert counts == {'copied': 3, 'skipped': 0, 'deleted': 0}
+    assert sorted(os.listdir(destination)) == ['one.txt', 'sub', 'two.txt']
+    assert not os.path.exists(destination + 'one.txt')
+    assert util.sync_directory(os.path.join(source, ''), destination,
+                               delete=True)['skipped'] == 3
+
+    # A directory and a symbolic link to it are both mirrored
+    os.symlink(os.path.abspath(os.path.join(source, 'sub')),
+               os.path.join(source, 'alias'))
+    counts = util.sync_directory(source, destination, delete=True)
+    assert counts == {'copied': 1, 'skipped': 3, 'deleted': 0}
+    assert sorted(os.listdir(destination)) == ['alias', 'one.txt', 'sub',
+                                               'two.txt']
+    assert os.path.isfile(os.path.join(destination, 'sub', 'three.txt'))
+    assert os.path.isfile(os.path.join(destination, 'alias', 'three.txt'))
+    shutil.rmtree(source)
+    shutil.rmtree(destination)
+# ------------------------------------------------------------------------------
+
+
+def test_count_lines_in_files():
+    """
+
+    This function tests the OSUtilities.count_lines_in_files function and
+    the handling of a final line without a newline by
+    OSUtilities.file_line_count
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        file1 = '../data/test/text_file.txt'
+        file2 = '../data/test/line_count.txt'
+        file3 = '../data/test/empty_lines.txt'
+    else:
+        file1 = r'..\data\test\text_file.txt'
+        file2 = r'..\data\test\line_count.txt'
+        file3 = r'..\data\test\empty_lines.txt'
+    with open(file2, 'w') as file:
+        file.write('line\n' * 1000)
+    util.create_file(file3)
+    assert util.file_line_count(file2, chunk_size=7) == 1000
+    lines = util.count_lines_in_files([file1, file2, file3], workers=3)
+    assert lines == {file1: 4, file2: 1000, file3: 0}
+    os.remove(file2)
+    os.remove(file3)
+# ------------------------------------------------------------------------------
+
+
+def test_text_stats():
+    """
+
+    This function tests the OSUtilities.text_stats function to ensure it
+    matches the individual line, word, size and occurrence functions
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        file1 = '../data/test/text_file.txt'
+        file2 = '../data/test/stats_file.txt'
+    else:
+        file1 = r'..\data\test\text_file.txt'
+        file2 = r'..\data\test\stats_file.txt'
+    with open(file2, 'w') as file:
+        file.write('the file, the end.\n' * 50)
+    stats = util.text_stats([file1, file2], words=['file', 'the'], workers=2)
+    assert stats[file1] == {'lines': 4, 'words': 21, 'bytes': 109,
+                            'occurrences': {'file': 4, 'the': 2}}
+    assert stats[file2] == {'lines': 50, 'words': 200,
+                            'bytes': os.stat(file2).st_size,
+                            'occurrences': {'file': 50, 'the': 100}}
+    assert util.text_stats([file1], workers=1)[file1]['occurrences'] == {}
+    os.remove(file2)
+# ------------------------------------------------------------------------------
+
+
+def test_count_patterns_in_files():
+    """
+
+    This function tests the OSUtilities.count_patterns_in_files function
+    with keywords and regular expressions
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        file1 = '../data/test/text_file.txt'
+        file2 = '../data/test/pattern_file.txt'
+    else:
+        file1 = r'..\data\test\text_file.txt'
+        file2 = r'..\data\test\pattern_file.txt'
+    with open(file2, 'w') as file:
+        file.write('ERROR 12 in file\nWarning: files missing\nerror 7\n' * 20)
+    counts = util.count_patterns_in_files([file1, file2],
+                                          ['file', 'this', 'error'],
+                                          ignore_case=True, workers=2)
+    assert counts.tolist() == [[4, 2, 0], [20, 0, 40]]
+    counts = util.count_patterns_in_files([file1, file2], ['file', 'error'],
+                                          chunk_size=5)
+    assert counts.tolist() == [[4, 0], [20, 20]]
+    counts = util.count_patterns_in_files([file2], [r'ERROR \d+', r'files?'],
+                                          regex=True)
+    assert counts.tolist() == [[20, 40]]
+
+    # Each regular expression is counted on its own, even where it overlaps
+    # another pattern, and may use its own groups
+    with open(file2, 'w') as file:
+        file.write('ERROR 12 in file\nERROR here\naa ab\n')
+    counts = util.count_patterns_in_files([file2], ['ERROR', r'ERROR [0-9]+',
+                                                    r'(a)\1'], regex=True)
+    assert counts.tolist() == [[2, 1, 1]]
+
+    # Keywords that share a prefix count the longest whole word
+    with open(file2, 'w') as file:
+        file.write('file files find fin fi.le a.b a\n')
+    counts = util.count_patterns_in_files([file2], ['fi', 'file', 'files',
+                                                    'find', 'a.b', 'a'],
+                                          as_frame=True)
+    assert counts.columns.tolist() == ['fi', 'file', 'files', 'find',
+                                       'a.b', 'a']
+    assert counts.index.tolist() == [file2]
+    assert counts.loc[file2].tolist() == [1, 1, 1, 1, 1, 1]
+    os.remove(file2)
+# ------------------------------------------------------------------------------
+
+
+def test_directory_usage():
+    """
+
+    This function tests the OSUtilities.directory_usage function to ensure
+    that it totals each directory, counts hard links once and updates its
+    cache when a directory changes
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        directory = '../data/test/usage_directory'
+    else:
+        directory = r'..\data\test\usage_directory'
+    first = os.path.join(directory, 'first')
+    second = os.path.join(directory, 'second')
+    os.makedirs(os.path.join(first, 'deeper'))
+    os.mkdir(second)
+    for name, size in ((os.path.join(directory, 'top.bin'), 10),
+                       (os.path.join(first, 'one.bin'), 100),
+                       (os.path.join(first, 'deeper', 'two.bin'), 1000)):
+        with open(name, 'wb') as file:
+            file.write(b'x' * size)
+    os.link(os.path.join(first, 'deeper', 'two.bin'),
+            os.path.join(second, 'link.bin'))
+    cache = {}
+    usage = util.directory_usage(directory, workers=2, cache=cache)
+    assert usage[directory] == 1110
+    assert usage[first] + usage[second] == 1100
+    assert usage[first] == 100 + usage[os.path.join(first, 'deeper')]
+    assert len(cache) == 4
+
+    with open(os.path.join(second, 'new.bin'), 'wb') as file:
+        file.write(b'x' * 5)
+    shutil.rmtree(os.path.join(first, 'deeper'))
+    usage = util.directory_usage(directory, cache=cache)
+    assert usage == {directory: 1115, first: 100, second: 1005}
+    assert len(cache) == 3
+    shutil.rmtree(directory)
+# ------------------------------------------------------------------------------
+
+
+def test_find_duplicates():
+    """
+
+    This function tests the OSUtilities.find_duplicates function with small
+    files, large files that differ only in the middle, hard links and an
+    index file
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        directory = '../data/test/duplicate_directory'
+        index = '../data/test/duplicate_index.json'
+    else:
+        directory = r'..\data\test\duplicate_directory'
+        index = r'..\data\test\duplicate_index.json'
+    nested = os.path.join(directory, 'nested')
+    os.makedirs(nested)
+    large = b'a' * 100000 + b'b' * 100000 + b'c' * 100000
+    changed = b'a' * 100000 + b'B' * 100000 + b'c' * 100000
+    contents = {os.path.join(directory, 'small.txt'): b'same text',
+                os.path.join(nested, 'small_copy.txt'): b'same text',
+                os.path.join(directory, 'other.txt'): b'diff text',
+                os.path.join(directory, 'large.bin'): large,
+                os.path.join(nested, 'large_copy.bin'): large,
+                os.path.join(nested, 'large_changed.bin'): changed}
+    for name, data in contents.items():
+        with open(name, 'wb') as file:
+            file.write(data)
+    os.link(os.path.join(directory, 'small.txt'),
+            os.path.join(nested, 'small_link.txt'))
+    expected = [sorted([os.path.join(directory, 'large.bin'),
+                        os.path.join(nested, 'large_copy.bin')]),
+                sorted([os.path.join(directory, 'small.txt'),
+                        os.path.join(nested, 'small_copy.txt')])]
+    duplicates = util.find_duplicates(directory, workers=2, index_file=index)
+    assert duplicates == expected
+    assert os.path.isfile(index)
+    assert util.find_duplicates(directory, index_file=index) == expected
+    shutil.rmtree(directory)
+    os.remove(index)
+# ------------------------------------------------------------------------------
+
+
+def test_parallel_copy_matches_serial():
+    """
+
+    This function tests the OSUtilities.copy_directory function to ensure
+    that the parallel copy engine produces the same tree as the serial copy,
+    including directories reached through a symbolic link and destinations
+    whose parent directories do not exist
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        source = '../data/test/serial_source'
+        serial = '../data/test/serial_copy/deep'
+        parallel = '../data/test/parallel_copy/deep'
+    else:
+        source = r'..\data\test\serial_source'
+        serial = r'..\data\test\serial_copy\deep'
+        parallel = r'..\data\test\parallel_copy\deep'
+    os.makedirs(os.path.join(source, 'a', 'b'))
+    util.create_file(os.path.join(source, 'a', 'b', 'file.txt'))
+    util.create_file(os.path.join(source, 'top.txt'))
+    os.symlink(os.path.abspath(os.path.join(source, 'a')),
+               os.path.join(source, 'alias'))
+    util.copy_directory(source, serial)
+    util.copy_directory(source, parallel, workers=4)
+
+    def tree(root):
+        return sorted(os.path.relpath(os.path.join(path, name), root)
+                      for path, dirs, names in os.walk(root)
+                      for name in dirs + names)
+    assert tree(parallel) == tree(serial)
+    assert os.path.isfile(os.path.join(parallel, 'alias', 'b', 'file.txt'))
+    assert os.path.isfile(os.path.join(parallel, 'a', 'b', 'file.txt'))
+    shutil.rmtree(source)
+    shutil.rmtree(os.path.dirname(serial))
+    shutil.rmtree(os.path.dirname(parallel))
+# ==============================================================================
+# ==============================================================================
+# Test FileIndex class
+
+
+def test_file_index():
+    """
+
+    This function tests the FileIndex class to ensure that it builds the
+    index, detects added, modified and removed files and answers queries
+    """
+    util = OSUtilities()
+    plat = platform.system()
+    if plat == 'Darwin':
+        directory = '../data/test/index_directory'
+        database = '../data/test/file_index.db'
+    else:
+        directory = r'..\data\test\index_directory'
+        database = r'..\data\test\file_index.db'
+    os.makedirs(os.path.join(directory, 'nested'))
+    for name, size in (('data.csv', 2000), ('notes.txt', 10),
+                       (os.path.join('nested', 'more.csv'), 50)):
+        with open(os.path.join(directory, name), 'w') as file:
+            file.write('x' * size)
+    with FileIndex(database, directory, hashes=True) as index:
+        assert index.update() == {'added': 3, 'modified': 0, 'removed': 0,
+                                  'unchanged': 0}
+        csv = index.find(extension='.csv')
+        assert list(csv['name']) == ['data.csv', 'more.csv']
+        assert index.find(pattern='*.csv', min_size=100)['size'].tolist() == [2000]
+        assert index.find(max_size=10)['hash'].notnull().all()
+
+        with open(os.path.join(directory, 'notes.txt'), 'a') as file:
+            file.write('more notes')
+        os.utime(os.path.join(directory, 'notes.txt'), (4.0e9, 4.0e9))
+        os.remove(os.path.join(directory, 'nested', 'more.csv'))
+        util.create_file(os.path.join(directory, 'new.txt'))
+        assert index.update() == {'added': 1, 'modified': 1, 'removed': 1,
+                                  'unchanged': 1}
+        recent = index.changed_since(3.9e9)
+        assert list(recent['name']) == ['notes.txt']
+        assert recent['size'].tolist() == [20]
+    shutil.rmtree(directory)
+    os.remove(database)
 # ==============================================================================
 # ==============================================================================
 # eof